@@ -1,4 +1,7 @@
 from django.contrib import admin
+
+from .cloning import clone_course
+from .deletion import tombstone_course
 from .models import Subject, Course, Module
 
 
@@ -35,9 +38,32 @@ class CourseAdmin(admin.ModelAdmin):
     search_fields : allows searching by title and overvie
     prepopulated_fields : autmatically populate slug field
     inlines : inlined Module class
+    actions : allows duplicating selected courses
     """
     list_display = ['title', 'subject', 'created']
     list_filter = ['created', 'subject']
     search_fields = ['title', 'overview']
     prepopulated_fields = {'slug': ('title',)}
     inlines = [ModuleInline]
+    actions = ['duplicate']
+
+    @admin.action(description='Duplicate selected courses',
+                  permissions=['add'])
+    def duplicate(self, request, queryset):
+        """
+        Creates draft copies of selected courses for their owners.
+        """
+        for course in queryset:
+            clone_course(course)
+        self.message_user(request, '{} courses duplicated'.format(
+            len(queryset)))
+
+    def delete_model(self, request, obj):
+        """
+        Hides the course at once and purges it in background.
+        """
+        tombstone_course(obj)
+
+    def delete_queryset(self, request, queryset):
+        for course in queryset:
+            tombstone_course(course)
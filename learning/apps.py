@@ -7,3 +7,13 @@ class LearningConfig(AppConfig):
     """
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'learning'
+
+    def ready(self):
+        """Turns on signals"""
+        import learning.signals
+
+    def warm_up(self):
+        """Builds form classes of content items"""
+        from learning.forms import get_content_form
+        for model_name in ('text', 'video', 'image', 'file'):
+            get_content_form(self.get_model(model_name))
@@ -0,0 +1,422 @@
+import json
+import posixpath
+import shutil
+import tarfile
+import tempfile
+import time
+import zlib
+from itertools import islice
+from uuid import uuid4
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import SuspiciousOperation, ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+from django.db.models.fields.files import FieldFile
+from django.utils.text import slugify
+
+from .models import Content, Course, Module, Subject
+from .uploads import get_file_field
+
+BUNDLE_FORMAT = 1
+
+MANIFEST = 'bundle.json'
+
+MEDIA_DIR = 'media/'
+
+RECORDS_DIR = 'records/'
+
+IMPORTS_DIR = 'imports/'
+
+# max_length of file fields of courses and items
+MEDIA_NAME_LENGTH = 100
+
+BATCH_SIZE = 500
+
+CHUNK_SIZE = 64 * 1024
+
+ITEM_MODELS = ('text', 'video', 'image', 'file')
+
+EXCLUDED_FIELDS = ('id', 'owner', 'created', 'updated')
+
+
+class BundleError(Exception):
+    """
+    Raised when a bundle cannot be imported.
+    """
+
+
+def get_item_model(model_name):
+    if model_name not in ITEM_MODELS:
+        raise BundleError('Unknown item type {}'.format(model_name))
+    return apps.get_model('learning', model_name)
+
+
+def get_item_fields(model):
+    """
+    Returns names of item fields stored in the bundle.
+    """
+    return [field.attname for field in model._meta.concrete_fields
+            if field.name not in EXCLUDED_FIELDS]
+
+
+def get_item_values(item):
+    """
+    Returns values of item fields stored in the bundle,
+    files as their names in the storage.
+    """
+    values = {}
+    for name in get_item_fields(type(item)):
+        value = getattr(item, name)
+        values[name] = value.name if isinstance(value, FieldFile) else value
+    return values
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_contents(course):
+    """
+    Yields contents of the course with their items,
+    which are fetched in batches, one query per item type.
+    """
+    contents = Content.objects.filter(module__course=course) \
+        .select_related('content_type') \
+        .order_by('module__order', 'module_id', 'order', 'id')
+    for batch in batched(contents.iterator(chunk_size=BATCH_SIZE),
+                         BATCH_SIZE):
+        ids = {}
+        for content in batch:
+            ids.setdefault(content.content_type.model,
+                           []).append(content.object_id)
+        items = {}
+        for model_name, pks in ids.items():
+            model = get_item_model(model_name)
+            for item in model.objects.filter(pk__in=pks):
+                items[model_name, item.pk] = item
+        for content in batch:
+            item = items.get((content.content_type.model, content.object_id))
+            if item is not None:
+                yield content, item
+
+
+def iter_records(course):
+    """
+    Yields records of the course, its modules and contents with items.
+    Modules come before contents, which refer to them by old id.
+    """
+    yield {'type': 'course',
+           'title': course.title,
+           'slug': course.slug,
+           'overview': course.overview,
+           'status': course.status,
+           'thumbnail': course.thumbnail.name,
+           'subject': {'title': course.subject.title,
+                       'slug': course.subject.slug}}
+    for module in course.modules.order_by('order', 'id').iterator(
+            chunk_size=BATCH_SIZE):
+        yield {'type': 'module',
+               'id': module.id,
+               'title': module.title,
+               'description': module.description,
+               'order': module.order}
+    for content, item in iter_contents(course):
+        model = type(item)
+        yield {'type': 'content',
+               'module': content.module_id,
+               'order': content.order,
+               'model': model._meta.model_name,
+               'item': get_item_values(item)}
+
+
+def iter_file_names(course):
+    yield course.thumbnail.name
+    for content, item in iter_contents(course):
+        model = type(item)
+        if model._meta.model_name in ('image', 'file'):
+            yield getattr(item, get_file_field(model).attname).name
+
+
+def iter_media_names(course):
+    """
+    Yields names of files used by the course, each once.
+    """
+    seen = set()
+    for name in iter_file_names(course):
+        if name and name not in seen:
+            seen.add(name)
+            yield name
+
+
+def iter_member(name, size, chunks):
+    """
+    Yields tar member: header, data and padding to full block.
+    Data is streamed, so the member is never held in memory.
+    """
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(time.time())
+    yield info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+    written = 0
+    for chunk in chunks:
+        written += len(chunk)
+        yield chunk
+    if written != size:
+        raise BundleError('{} changed during export'.format(name))
+    if size % tarfile.BLOCKSIZE:
+        yield tarfile.NUL * (tarfile.BLOCKSIZE - size % tarfile.BLOCKSIZE)
+
+
+def iter_file(storage, name):
+    with storage.open(name) as file:
+        while True:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_tar(course, storage):
+    """
+    Yields tar archive of the course: manifest, media files and
+    records split into NDJSON members of BATCH_SIZE lines.
+    Media come first, so importer stores them before the records
+    that refer to them.
+    """
+    manifest = json.dumps({'format': BUNDLE_FORMAT,
+                           'course': course.slug}).encode()
+    yield from iter_member(MANIFEST, len(manifest), [manifest])
+    for name in iter_media_names(course):
+        if storage.exists(name):
+            yield from iter_member(MEDIA_DIR + name, storage.size(name),
+                                   iter_file(storage, name))
+    for number, records in enumerate(batched(iter_records(course),
+                                             BATCH_SIZE)):
+        data = b''.join(json.dumps(record).encode() + b'\n'
+                        for record in records)
+        yield from iter_member('{}{:06d}.ndjson'.format(RECORDS_DIR, number),
+                               len(data), [data])
+    yield tarfile.NUL * tarfile.BLOCKSIZE * 2
+
+
+def gzip_stream(chunks):
+    """
+    Compresses stream of bytes into gzip format on the fly.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_course(course, storage=default_storage):
+    """
+    Returns generator of course bundle, a gzipped tar archive.
+    """
+    return gzip_stream(iter_tar(course, storage))
+
+
+class Importer(object):
+    """
+    A class to represent import of a single course bundle.
+    Modules and contents are written with bulk_create in batches,
+    only ids of modules and names of media are kept in memory.
+    Media are stored in a directory of the import, so a bundle cannot
+    take names of renditions or other files in advance.
+    """
+    def __init__(self, owner, storage):
+        self.owner = owner
+        self.storage = storage
+        self.media_dir = '{}{}/'.format(IMPORTS_DIR, uuid4().hex)
+        self.course = None
+        self.modules = {}
+        self.media = {}
+        self.module_records = []
+        self.contents = []
+
+    def save_media(self, member, file):
+        """
+        Stores media file of the member in directory of the import,
+        under its base name, so names of media do not grow with every
+        export and import. File is copied to a temporary file first,
+        so truncated bundles leave no partial files behind.
+        """
+        name = member.name[len(MEDIA_DIR):]
+        basename = posixpath.basename(name)
+        if basename in ('', '.', '..'):
+            raise BundleError('Invalid media name {}'.format(member.name))
+        path = self.media_dir + basename
+        with tempfile.TemporaryFile() as temporary:
+            shutil.copyfileobj(file, temporary, CHUNK_SIZE)
+            temporary.seek(0)
+            self.media[name] = self.storage.save(
+                path, File(temporary, name=path),
+                max_length=MEDIA_NAME_LENGTH)
+
+    def get_media_name(self, name):
+        """
+        Returns storage name of the media file of the bundle stored
+        under the name. Names of files missing from the bundle are
+        cleared, so a bundle cannot point at files of other users.
+        """
+        return self.media.get(name, '')
+
+    def add_record(self, record):
+        if not isinstance(record, dict):
+            raise BundleError('Record has to be an object')
+        kind = record.get('type')
+        if kind == 'course':
+            self.create_course(record)
+        elif self.course is None:
+            raise BundleError('Course record has to come first')
+        elif kind == 'module':
+            self.module_records.append(record)
+            if len(self.module_records) >= BATCH_SIZE:
+                self.flush_modules()
+        elif kind == 'content':
+            self.flush_modules()
+            self.contents.append(record)
+            if len(self.contents) >= BATCH_SIZE:
+                self.flush_contents()
+        else:
+            raise BundleError('Unknown record type {}'.format(kind))
+
+    def create_course(self, record):
+        if record['status'] not in dict(Course.STATUS_CHOICES):
+            raise BundleError('Unknown course status {}'.format(
+                record['status']))
+        subject = Subject.objects.filter(
+            slug=record['subject']['slug']).first()
+        if subject is None:
+            subject = Subject.objects.create(
+                title=record['subject']['title'],
+                slug=record['subject']['slug'])
+        self.course = Course.objects.create(
+            owner=self.owner,
+            subject=subject,
+            title=record['title'],
+            slug=Course.objects.unique_slug(slugify(record['slug'])),
+            overview=record['overview'],
+            status=record['status'],
+            thumbnail=self.get_media_name(record['thumbnail']))
+
+    def flush_modules(self):
+        """
+        Creates modules of buffered records and remembers their new ids.
+        """
+        if not self.module_records:
+            return
+        modules = Module.objects.bulk_create([
+            Module(course=self.course,
+                   title=record['title'],
+                   description=record['description'],
+                   order=record['order'])
+            for record in self.module_records])
+        for record, module in zip(self.module_records, modules):
+            self.modules[record['id']] = module.id
+        self.module_records = []
+
+    def flush_contents(self):
+        """
+        Creates items and contents of buffered records,
+        with one insert per item type and one for contents.
+        """
+        if not self.contents:
+            return
+        items = {}
+        for record in self.contents:
+            model = get_item_model(record['model'])
+            if not isinstance(record['item'], dict):
+                raise BundleError('Item of content has to be an object')
+            values = {name: record['item'].get(name)
+                      for name in get_item_fields(model)}
+            exclude = list(EXCLUDED_FIELDS)
+            if record['model'] in ('image', 'file'):
+                name = get_file_field(model).attname
+                values[name] = self.get_media_name(values[name])
+                exclude.append(name)
+            item = model(owner=self.owner, **values)
+            try:
+                item.full_clean(exclude=exclude, validate_unique=False)
+            except ValidationError as error:
+                raise BundleError('Invalid {} item: {}'.format(
+                    record['model'], error)) from error
+            items.setdefault(model, []).append(item)
+        for model, objs in items.items():
+            model.objects.bulk_create(objs)
+        content_types = ContentType.objects.get_for_models(*items)
+        positions = {model: iter(objs) for model, objs in items.items()}
+        contents = []
+        for record in self.contents:
+            model = get_item_model(record['model'])
+            if record['module'] not in self.modules:
+                raise BundleError('Content refers to unknown module')
+            contents.append(Content(module_id=self.modules[record['module']],
+                                    order=record['order'],
+                                    content_type=content_types[model],
+                                    object_id=next(positions[model]).pk))
+        Content.objects.bulk_create(contents)
+        self.contents = []
+
+    def discard_media(self):
+        for name in self.media.values():
+            self.storage.delete(name)
+
+
+def import_course(fileobj, owner, storage=default_storage):
+    """
+    Imports course bundle read from the file object as course of the
+    owner. Bundle is read as a stream, member after member.
+    Course is created in one transaction and indexed for search
+    by signal after commit. Items are validated before they are written,
+    values the database rejects fail the import as well.
+    Stored media are removed if import fails.
+    """
+    importer = Importer(owner, storage)
+    try:
+        with transaction.atomic():
+            read_bundle(fileobj, importer)
+    except (tarfile.TarError, EOFError, OSError, ValueError, KeyError,
+            TypeError, zlib.error, SuspiciousOperation,
+            DatabaseError) as error:
+        importer.discard_media()
+        raise BundleError('Invalid bundle: {}'.format(error)) from error
+    except Exception:
+        importer.discard_media()
+        raise
+    return importer.course
+
+
+def read_bundle(fileobj, importer):
+    """
+    Passes members of the bundle to the importer as they are read.
+    """
+    with tarfile.open(fileobj=fileobj, mode='r|gz') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            file = tar.extractfile(member)
+            if member.name == MANIFEST:
+                manifest = json.load(file)
+                if manifest.get('format') != BUNDLE_FORMAT:
+                    raise BundleError('Unsupported bundle format')
+            elif member.name.startswith(MEDIA_DIR):
+                importer.save_media(member, file)
+            elif member.name.startswith(RECORDS_DIR):
+                for line in file:
+                    if line.strip():
+                        importer.add_record(json.loads(line))
+    if importer.course is None:
+        raise BundleError('Bundle has no course')
+    importer.flush_modules()
+    importer.flush_contents()
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from tutor.cache import bump_version, get_version
+
+from .models import Content, Subject
+
+SUBJECTS_VERSION_KEY = 'learning:subjects:version'
+
+COURSE_VERSION_KEY = 'learning:course:{}:version'
+
+CONTENT_COUNT_KEY = 'learning:course:{}:contents:{}'
+
+_subjects = {}
+
+
+def get_course_version(course_id):
+    """
+    Returns version of course modules, used in keys of cached fragments.
+    """
+    return get_version(COURSE_VERSION_KEY.format(course_id))
+
+
+def bump_course_version(course_id):
+    """
+    Invalidates cached fragments of the course.
+    """
+    bump_version(COURSE_VERSION_KEY.format(course_id))
+
+
+def get_content_count(course_id):
+    """
+    Returns number of contents of the course, which completion of its
+    students is measured against. Count is cached under the version
+    of the course, bumped when a content is added or deleted.
+    Cached values are read from the primary, as replicas may lag behind.
+    """
+    key = CONTENT_COUNT_KEY.format(course_id, get_course_version(course_id))
+    count = cache.get(key)
+    if count is None:
+        count = Content.objects.using(DEFAULT_DB_ALIAS).filter(
+            module__course_id=course_id).count()
+        cache.set(key, count, None)
+    return count
+
+
+def get_subjects():
+    """
+    Returns list of subjects.
+    Subjects are kept in the shared cache and copied to the process,
+    both copies are keyed by version, bumped when any subject changes.
+    Cached values are read from the primary, as replicas may lag behind.
+    """
+    version = get_version(SUBJECTS_VERSION_KEY)
+    if _subjects.get('version') != version:
+        key = 'learning:subjects:{}'.format(version)
+        subjects = cache.get(key)
+        if subjects is None:
+            subjects = list(Subject.objects.using(DEFAULT_DB_ALIAS))
+            cache.set(key, subjects, None)
+        _subjects.update(version=version, subjects=subjects)
+    return _subjects['subjects']
@@ -1,10 +1,14 @@
-from .models import Subject
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_subjects
 
 
 def subjects_processor(request):
     """
     A context processor that allows to  prosses subject
     objects in every template.
+    Subjects are loaded lazily from the cache, only by
+    templates that use them.
     """
-    subjects = Subject.objects.all()            
+    subjects = SimpleLazyObject(get_subjects)
     return {'subjects': subjects}
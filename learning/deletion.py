@@ -0,0 +1,191 @@
+import logging
+from datetime import timedelta
+from functools import partial
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from tutor.tasks import submit
+
+from .cache import bump_course_version
+from .models import (Content, ContentProgress, Course, Enrollment, File, Image,
+                     Module, Text, Upload, Video)
+from .renditions import forget_renditions
+from .search import unindex_course
+from .uploads import get_file_field
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+ITEM_MODELS = [Text, Video, Image, File]
+
+ORPHAN_GRACE = timedelta(hours=24)
+
+
+def get_referenced_names(names):
+    """
+    Returns those of the storage names, which rows still refer to.
+    Files are shared between copies of courses, so a file is removed
+    only when nothing refers to it.
+    """
+    referenced = set()
+    for queryset, field_name in [(Image.objects, 'image'),
+                                 (File.objects, 'other_file'),
+                                 (Course.all_objects, 'thumbnail'),
+                                 (Upload.objects.filter(status='Pending'),
+                                  'name')]:
+        referenced.update(queryset.filter(
+            **{field_name + '__in': names}).values_list(field_name,
+                                                       flat=True))
+    return referenced
+
+
+def delete_unreferenced_files(names, storage=default_storage):
+    """
+    Removes files of the storage that no row refers to,
+    and forgets their renditions.
+    """
+    names = {name for name in names if name}
+    unreferenced = names - get_referenced_names(names)
+    for name in unreferenced:
+        storage.delete(name)
+    forget_renditions(unreferenced)
+
+
+def delete_files(names, storage=default_storage):
+    """
+    Removes unreferenced files once the transaction deleting their
+    rows is committed, so a rolled back deletion keeps its files.
+    """
+    if names:
+        transaction.on_commit(partial(delete_unreferenced_files,
+                                      list(names), storage))
+
+
+def delete_items(contents):
+    """
+    Deletes items of the contents, with one query per item type.
+    Returns storage names of deleted files.
+    """
+    ids = {}
+    for content in contents:
+        ids.setdefault(content.content_type.model_class(),
+                       []).append(content.object_id)
+    names = []
+    for model, pks in ids.items():
+        items = model.objects.filter(pk__in=pks)
+        if model in (Image, File):
+            names.extend(items.values_list(get_file_field(model).name,
+                                           flat=True))
+        items.delete()
+    return names
+
+
+def tombstone_course(course):
+    """
+    Marks the course as deleted, which hides it at once,
+    and purges its rows in background after commit.
+    Slug of the course is freed for new courses.
+    """
+    Course.all_objects.filter(pk=course.pk).update(
+        deleted_at=timezone.now(),
+        slug='_deleted-{}'.format(course.pk))
+    unindex_course(course.pk)
+    bump_course_version(course.pk)
+    transaction.on_commit(partial(submit, purge_course, course.pk))
+
+
+def purge_batch(course_id, batch_size=BATCH_SIZE):
+    """
+    Deletes one batch of rows of the deleted course in one transaction:
+    progress and enrollments of students first, then contents with their
+    items, then modules, then the course.
+    Returns False once the course is gone.
+    """
+    with transaction.atomic():
+        for queryset in (ContentProgress.objects.filter(
+                             enrollment__course_id=course_id),
+                         Enrollment.objects.filter(course_id=course_id)):
+            pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if pks:
+                queryset.model.objects.filter(pk__in=pks).delete()
+                return True
+        contents = list(Content.objects
+                        .filter(module__course_id=course_id)
+                        .select_related('content_type')[:batch_size])
+        if contents:
+            delete_files(delete_items(contents))
+            Content.objects.filter(
+                pk__in=[content.pk for content in contents]).delete()
+            return True
+        modules = list(Module.objects.filter(course_id=course_id)
+                       .values_list('pk', flat=True)[:batch_size])
+        if modules:
+            uploads = Upload.objects.filter(module__in=modules,
+                                            status='Pending')
+            delete_files(list(uploads.values_list('name', flat=True)))
+            Module.objects.filter(pk__in=modules).delete()
+            return True
+        course = Course.all_objects.filter(
+            pk=course_id, deleted_at__isnull=False).first()
+        if course is not None:
+            course.delete()
+            delete_files([course.thumbnail.name])
+        return False
+
+
+def purge_course(course_id, batch_size=BATCH_SIZE):
+    """
+    Deletes rows and files of the deleted course in batches,
+    so no transaction holds locks for long.
+    Failed purge is logged, purge_deleted command finishes it later.
+    """
+    try:
+        while purge_batch(course_id, batch_size):
+            pass
+    except Exception:
+        logger.exception('Purge of course %s failed', course_id)
+
+
+def purge_deleted_courses(batch_size=BATCH_SIZE):
+    """
+    Purges all deleted courses, e.g. those whose background purge
+    was interrupted. Returns number of purged courses.
+    """
+    pks = list(Course.all_objects.filter(deleted_at__isnull=False)
+               .values_list('pk', flat=True))
+    for pk in pks:
+        purge_course(pk, batch_size)
+    return len(pks)
+
+
+def sweep_orphans(batch_size=BATCH_SIZE, grace=ORPHAN_GRACE):
+    """
+    Deletes items that no content refers to, left behind by deletions
+    made before items were purged with their contents.
+    Items younger than grace are skipped, as contents are created
+    after their items. Returns number of deleted items by model name.
+    """
+    created_before = timezone.now() - grace
+    deleted = {}
+    for model in ITEM_MODELS:
+        content_type = ContentType.objects.get_for_model(model)
+        orphans = model.objects.filter(created__lt=created_before).exclude(
+            pk__in=Content.objects.filter(
+                content_type=content_type).values('object_id'))
+        deleted[model._meta.model_name] = 0
+        while True:
+            with transaction.atomic():
+                pks = list(orphans.values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                items = model.objects.filter(pk__in=pks)
+                if model in (Image, File):
+                    delete_files(list(items.values_list(
+                        get_file_field(model).name, flat=True)))
+                items.delete()
+            deleted[model._meta.model_name] += len(pks)
+    return deleted
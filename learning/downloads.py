@@ -0,0 +1,168 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
+from django.utils.cache import (add_never_cache_headers,
+                                get_conditional_response)
+from django.utils.http import http_date, quote_etag
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_content_disposition(filename):
+    """
+    Returns Content-Disposition header of an attachment,
+    with non-ASCII file names encoded as in RFC 6266.
+    """
+    try:
+        filename.encode('ascii')
+        return 'attachment; filename="{}"'.format(
+            filename.replace('\\', '\\\\').replace('"', r'\"'))
+    except UnicodeEncodeError:
+        return "attachment; filename*=utf-8''{}".format(quote(filename))
+
+
+def parse_range(header, size):
+    """
+    Returns first and last byte of single byte range of the Range
+    header, None if the header should be ignored, or raises ValueError
+    if the range cannot be satisfied. Multiple ranges are ignored,
+    the whole file is sent instead.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError('Range starts after end of file')
+    return start, end
+
+
+def iter_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+class LocalDownloadBackend(object):
+    """
+    A class to represent downloads from local file system storage.
+    Conditional requests are answered by Django, the transfer is handed
+    to the web server with SENDFILE_HEADER: X-Accel-Redirect for nginx,
+    which serves SENDFILE_URL as internal location of MEDIA_ROOT,
+    or X-Sendfile for Apache and lighttpd. Web server answers Range
+    requests itself. Without SENDFILE_HEADER, e.g. in development,
+    files are streamed by Django, with Range support.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+
+    def respond(self, request, name, filename):
+        path = self.storage.path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            raise Http404('File does not exist')
+        etag = quote_etag('{:x}-{:x}'.format(int(stat.st_mtime),
+                                              stat.st_size))
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            header = getattr(settings, 'SENDFILE_HEADER', None)
+            if header == 'X-Accel-Redirect':
+                response = HttpResponse()
+                response[header] = getattr(
+                    settings, 'SENDFILE_URL', '/protected-media/') + \
+                    quote(clean_name(name))
+            elif header:
+                response = HttpResponse()
+                response[header] = os.path.abspath(path)
+            else:
+                response = self.stream(request, path, stat.st_size, etag)
+            response['Content-Type'] = mimetypes.guess_type(name)[0] or \
+                'application/octet-stream'
+            response['Content-Disposition'] = get_content_disposition(
+                filename)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    def stream(self, request, path, size, etag):
+        """
+        Returns response streaming the file, or the requested byte range
+        of it, if the range is still valid for If-Range header.
+        """
+        if_range = request.headers.get('If-Range')
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size) \
+                if if_range in (None, etag) else None
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(size)
+            return response
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1 if size else 0
+        response = StreamingHttpResponse(iter_range(path, start, length))
+        if byte_range is not None:
+            response.status_code = 206
+            response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end,
+                                                                size)
+        response['Content-Length'] = length
+        return response
+
+
+class S3DownloadBackend(object):
+    """
+    A class to represent downloads from S3 storage.
+    Client is redirected to a presigned URL, which expires after
+    DOWNLOAD_URL_EXPIRE seconds. S3 answers Range and conditional
+    requests itself.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+        self.client = storage.connection.meta.client
+
+    def respond(self, request, name, filename):
+        url = self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.storage.bucket_name,
+                    'Key': self.storage._normalize_name(clean_name(name)),
+                    'ResponseContentDisposition':
+                        get_content_disposition(filename)},
+            ExpiresIn=getattr(settings, 'DOWNLOAD_URL_EXPIRE', 60))
+        response = HttpResponseRedirect(url)
+        add_never_cache_headers(response)
+        return response
+
+
+def get_backend(storage=default_storage):
+    """
+    Returns download backend matching the storage.
+    """
+    if isinstance(storage, S3Boto3Storage):
+        return S3DownloadBackend(storage)
+    return LocalDownloadBackend(storage)
@@ -1,30 +1,133 @@
-from django.db import models
-from django.core.exceptions import ObjectDoesNotExist
+from collections import defaultdict
+
+from django.db import connections, models, router, transaction
+from django.db.models import Max
+
 
 class OrderField(models.PositiveIntegerField):
     """
-    A class to represent custom OrderField. 
-    It sets order of the objects and sets object as last if 
+    A class to represent custom OrderField.
+    It sets order of the objects and sets object as last if
     value is not provided.
     """
-    
+
     def __init__(self, for_fields=None, *args, **kwargs):
         self.for_fields = for_fields
         super(OrderField, self).__init__(*args, **kwargs)
-        
+
+    def get_scope(self, model_instance):
+        """
+        Returns lookup of the fields that order is counted within.
+        """
+        return {self.model._meta.get_field(field).attname:
+                getattr(model_instance,
+                        self.model._meta.get_field(field).attname)
+                for field in self.for_fields or []}
+
+    def lock_scope(self, scope, using):
+        """
+        Locks rows related by for_fields, so concurrent transactions
+        allocate order in the same scope one after another.
+        Locks are taken only inside of a transaction.
+        """
+        if connections[using].get_autocommit():
+            return
+        for attname, value in scope.items():
+            field = next(field for field in self.model._meta.concrete_fields
+                         if field.attname == attname)
+            if field.is_relation and value is not None:
+                list(field.related_model._default_manager.using(using)
+                     .select_for_update().filter(pk=value).values('pk'))
+
+    def allocate(self, instances, using=None):
+        """
+        Sets consecutive order values on instances without one.
+        Instances are grouped by scope and every scope costs one lock
+        and one aggregate query, regardless of number of instances.
+        """
+        using = using or router.db_for_write(self.model)
+        scopes = defaultdict(list)
+        for instance in instances:
+            if getattr(instance, self.attname) is None:
+                scope = self.get_scope(instance)
+                scopes[tuple(sorted(scope.items()))].append(instance)
+        for key, scope_instances in scopes.items():
+            scope = dict(key)
+            self.lock_scope(scope, using)
+            last = (self.model._default_manager.using(using)
+                    .filter(**scope)
+                    .aggregate(last=Max(self.attname))['last'])
+            start = 0 if last is None else last + 1
+            for offset, instance in enumerate(scope_instances):
+                setattr(instance, self.attname, start + offset)
+
     def pre_save(self, model_instance, add):
         if getattr(model_instance, self.attname) is None:
-            try:
-                qs = self.model.objects.all()
-                if self.for_fields:
-                    query = {field: getattr(model_instance, field) for field in self.for_fields}
-                    qs = qs.filter(**query)
-                last_item = qs.latest(self.attname)
-                value = last_item.order + 1
-            except ObjectDoesNotExist:
-                value = 0
-            setattr(model_instance, self.attname, value)
-            return value
+            self.allocate([model_instance],
+                          using=model_instance._state.db)
+            return getattr(model_instance, self.attname)
         else:
             return super(OrderField,
-                        self).pre_save(model_instance, add)
\ No newline at end of file
+                        self).pre_save(model_instance, add)
+
+
+class OrderQuerySet(models.QuerySet):
+    """
+    A class to represent queryset of models ordered with OrderField.
+    """
+    def get_order_fields(self):
+        """
+        Returns OrderFields of the model.
+        """
+        return [field for field in self.model._meta.concrete_fields
+                if isinstance(field, OrderField)]
+
+    def allocate_order(self, objs):
+        """
+        Sets order of new objects in a batch,
+        within one locked allocation per scope.
+        Has to be called inside of a transaction to hold the lock
+        until objects are saved.
+        """
+        for field in self.get_order_fields():
+            field.allocate(objs, using=self.db)
+        return objs
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """
+        Overrides bulk_create to allocate order of all objects at once.
+        """
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            self.allocate_order(objs)
+            return super(OrderQuerySet, self).bulk_create(objs,
+                                                         *args, **kwargs)
+
+    def reorder(self, pks, field_name='order'):
+        """
+        Sets order of objects to position of their pk on the list.
+        The list has to hold all objects of its scopes, e.g. all modules
+        of the course, as positions of missing siblings would collide.
+        Raises ValueError otherwise.
+        Only objects whose order changed are updated, with one bulk_update.
+        """
+        positions = {str(pk): position for position, pk in enumerate(pks)}
+        if len(positions) != len(pks):
+            raise ValueError('Objects are repeated')
+        field = self.model._meta.get_field(field_name)
+        siblings = self
+        for name in field.for_fields or []:
+            attname = self.model._meta.get_field(name).attname
+            siblings = siblings.filter(**{attname + '__in': self.filter(
+                pk__in=pks).values(attname)})
+        objs = []
+        siblings = list(siblings.only('pk', field_name))
+        if {str(obj.pk) for obj in siblings} != set(positions):
+            raise ValueError('Order of all siblings has to be given')
+        for obj in siblings:
+            position = positions[str(obj.pk)]
+            if getattr(obj, field_name) != position:
+                setattr(obj, field_name, position)
+                objs.append(obj)
+        self.bulk_update(objs, [field_name])
+        return objs
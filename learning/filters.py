@@ -2,6 +2,7 @@ import django_filters
 from django_filters import CharFilter, DateFilter
 
 from .models import Course
+from .search import filter_courses
 
 
 class CourseFilter(django_filters.FilterSet):
@@ -10,12 +11,11 @@ class CourseFilter(django_filters.FilterSet):
 
     Attributes:
     ----------
-    title : filtering by title
+    title : full-text filtering by title, overview and module titles
     created_after : filtering by greater than or equal to created date
     created_before : filtering by lower than or equal to created date
     """
-    title = CharFilter(field_name='title', 
-                       lookup_expr='icontains',
+    title = CharFilter(method='search',
                        label='Title ')
     created_after = DateFilter(field_name="created", 
                                lookup_expr='gte',
@@ -26,4 +26,10 @@ class CourseFilter(django_filters.FilterSet):
     
     class Meta:
         model = Course
-        fields = ['title']
\ No newline at end of file
+        fields = ['title']
+
+    def search(self, queryset, name, value):
+        """
+        Filters courses with the search index instead of scanning titles.
+        """
+        return filter_courses(queryset, value)
\ No newline at end of file
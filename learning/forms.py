@@ -1,5 +1,7 @@
+from functools import lru_cache
+
 from django import forms
-from django.forms.models import inlineformset_factory
+from django.forms.models import inlineformset_factory, modelform_factory
 
 from .models import Course, Module
 
@@ -24,4 +26,23 @@ ModuleFormSet = inlineformset_factory(Course,
                                               'description',
                                               'order'],
                                               extra=3,
-                                              can_delete=True)
\ No newline at end of file
+                                              can_delete=True)
+
+class ImportCourseForm(forms.Form):
+    """
+    A class to represent form to import a course bundle.
+    """
+    bundle = forms.FileField(help_text='Course bundle (.tar.gz) '
+                                       'exported from tutor')
+
+
+@lru_cache(maxsize=None)
+def get_content_form(model):
+    """
+    Returns form class of a content item model.
+    Class is built once per process instead of on every request.
+    """
+    return modelform_factory(model, exclude=['owner',
+                                             'order',
+                                             'created',
+                                             'updated'])
@@ -0,0 +1,416 @@
+import json
+import math
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import (HTTPCookieProcessor, HTTPRedirectHandler,
+                            Request, build_opener)
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from learning import urls as learning_urls
+from learning.models import Content, Course
+from learning.renditions import make_token
+from users import urls as users_urls
+
+from .check_query_budgets import get_url_names
+from .seed import USER_PREFIX
+
+PERCENTILES = (50, 95, 99)
+
+
+class NoRedirect(HTTPRedirectHandler):
+    """
+    Returns redirects as responses, so every request is measured alone.
+    """
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder(object):
+    """
+    A class to represent results collected from all simulated users.
+    Every route has a list of latencies, query counts and errors.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, latency, queries, error):
+        with self.lock:
+            result = self.routes.setdefault(
+                route, {'latencies': [], 'queries': [], 'errors': 0})
+            result['latencies'].append(latency)
+            if queries is not None:
+                result['queries'].append(queries)
+            if error:
+                result['errors'] += 1
+
+    def summary(self, wall_time):
+        """
+        Returns percentiles of latency in milliseconds, throughput
+        and mean queries per request of every route.
+        """
+        summary = {}
+        for route, result in sorted(self.routes.items()):
+            latencies = sorted(result['latencies'])
+            stats = {'requests': len(latencies),
+                     'errors': result['errors'],
+                     'rps': len(latencies) / wall_time,
+                     'queries': (sum(result['queries'])
+                                 / len(result['queries'])
+                                 if result['queries'] else None)}
+            for percentile in PERCENTILES:
+                index = max(math.ceil(percentile / 100 * len(latencies)), 1)
+                stats['p{}'.format(percentile)] = \
+                    latencies[index - 1] * 1000
+            summary[route] = stats
+        return summary
+
+
+class SimulatedUser(object):
+    """
+    A class to represent HTTP client of one simulated user,
+    with its own cookies.
+    """
+    def __init__(self, base_url, recorder, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies),
+                                   NoRedirect)
+
+    def get_csrf_token(self):
+        return next((cookie.value for cookie in self.cookies
+                     if cookie.name == 'csrftoken'), '')
+
+    def request(self, route, url, method='GET', data=None, body=None,
+                headers=None, expected=(200,)):
+        """
+        Sends request and records its latency under the route name.
+        Returns status and body of the response.
+        """
+        headers = dict(headers or {})
+        if data is not None:
+            body = urlencode(data, doseq=True).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if method != 'GET':
+            headers['X-CSRFToken'] = self.get_csrf_token()
+        request = Request(self.base_url + url, data=body, headers=headers,
+                          method=method)
+        start = time.perf_counter()
+        try:
+            response = self.opener.open(request, timeout=self.timeout)
+        except HTTPError as error:
+            response = error
+        content = response.read()
+        latency = time.perf_counter() - start
+        queries = response.headers.get('X-Query-Count')
+        self.recorder.record('{} {}'.format(method, route), latency,
+                             int(queries) if queries else None,
+                             response.status not in expected)
+        return response.status, content
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that benchmarks a running server.
+    Simulated students browse courses and simulated teachers edit
+    them, each as one of seeded users, concurrently. Every route of
+    learning and users apps is requested. Reports latency percentiles,
+    throughput and queries per request, which the server sends when
+    DEBUG or QUERY_COUNT_HEADER is on, and compares them with a baseline.
+    Teachers upload small files, which stay in the storage. Students
+    enroll in courses of their users and complete a content, their
+    enrollments and progress stay in the database.
+    """
+    help = 'Benchmarks routes of a running server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--students', type=int, default=4)
+        parser.add_argument('--teachers', type=int, default=2)
+        parser.add_argument('--iterations', type=int, default=5,
+                            help='Scenario runs of every simulated user')
+        parser.add_argument('--password', default='seed',
+                            help='Password of seeded users')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--save', help='Saves results as baseline')
+        parser.add_argument('--baseline',
+                            help='Compares results with the baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative growth of p95 latency')
+        parser.add_argument('--min-delta', type=float, default=5,
+                            help='Ignored growth of p95 latency in ms')
+
+    def handle(self, *args, **options):
+        users = options['students'] + options['teachers']
+        targets = self.get_targets(users)
+        if len(targets) < users:
+            raise CommandError(
+                'Found {} seeded users with courses, {} needed. '
+                'Run seed first.'.format(len(targets), users))
+        recorder = Recorder()
+        threads = []
+        for index, target in enumerate(targets):
+            scenario = self.student if index < options['students'] \
+                else self.teacher
+            threads.append(threading.Thread(
+                target=self.run_user,
+                args=(scenario, target, recorder, options)))
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_time = time.perf_counter() - start
+        summary = recorder.summary(wall_time)
+        self.report(summary, wall_time)
+        self.report_missing(summary)
+        if options['save']:
+            with open(options['save'], 'w') as file:
+                json.dump(summary, file, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            self.compare(summary, baseline, options)
+
+    def get_targets(self, number):
+        """
+        Returns data used by simulated users: seeded users owning
+        a course with modules and contents.
+        """
+        targets = []
+        users = get_user_model().objects.filter(
+            username__startswith=USER_PREFIX,
+            course_created__modules__contents__isnull=False).distinct() \
+            .select_related('profile').order_by('username')[:number]
+        for user in users:
+            course = Course.objects.filter(
+                owner=user, modules__contents__isnull=False).first()
+            modules = list(course.modules.all())
+            module = next(module for module in modules
+                          if module.contents.exists())
+            targets.append({
+                'username': user.username,
+                'profile': user.profile.slug,
+                'course': course,
+                'modules': modules,
+                'module': module,
+                'contents': list(module.contents.values_list('id',
+                                                             flat=True)),
+            })
+        return targets
+
+    def run_user(self, scenario, target, recorder, options):
+        for iteration in range(options['iterations']):
+            user = SimulatedUser(options['url'], recorder,
+                                 options['timeout'])
+            self.login(user, target, options['password'])
+            scenario(user, target)
+            user.request('users:logout', reverse('users:logout'),
+                         expected=(302,))
+
+    def login(self, user, target, password):
+        url = reverse('users:login')
+        user.request('users:login', url)
+        user.request('users:login', url, method='POST',
+                     data={'username': target['username'],
+                           'password': password},
+                     expected=(302,))
+
+    def student(self, user, target):
+        """
+        Browses the course of the target.
+        """
+        course, module = target['course'], target['module']
+        user.request('learning:dashboard', reverse('learning:dashboard'))
+        user.request('learning:search', '{}?{}'.format(
+            reverse('learning:search'), urlencode({'q': course.title})))
+        user.request('learning:detail_course',
+                     reverse('learning:detail_course', args=[course.slug]))
+        user.request('learning:learning_view',
+                     reverse('learning:learning_view', args=[course.slug]))
+        user.request('learning:module_content_list',
+                     reverse('learning:module_content_list',
+                             args=[module.id]))
+        user.request('learning:enroll',
+                     reverse('learning:enroll', args=[course.slug]),
+                     method='POST', expected=(302,))
+        user.request('learning:module_learning',
+                     reverse('learning:module_learning',
+                             args=[course.slug, module.id]))
+        user.request('learning:complete_content',
+                     reverse('learning:complete_content',
+                             args=[target['contents'][0]]),
+                     method='POST')
+        user.request('users:profile',
+                     reverse('users:profile', args=[target['profile']]))
+        if course.thumbnail:
+            user.request('learning:rendition', reverse(
+                'learning:rendition',
+                args=[make_token(course.thumbnail.name, 250, 150, 'jpeg')]),
+                expected=(302,))
+
+    def teacher(self, user, target):
+        """
+        Edits the course of the target. Added content is deleted,
+        the rest of changes keeps data as it was.
+        """
+        course, module = target['course'], target['module']
+        user.request('learning:teacher_dashboard',
+                     reverse('learning:teacher_dashboard'))
+        user.request('learning:create_course',
+                     reverse('learning:create_course'))
+        user.request('learning:update_course',
+                     reverse('learning:update_course', args=[course.slug]))
+        user.request('learning:delete_course',
+                     reverse('learning:delete_course', args=[course.slug]))
+        user.request('learning:clone_course',
+                     reverse('learning:clone_course', args=[course.slug]))
+        user.request('learning:import_course',
+                     reverse('learning:import_course'))
+        user.request('learning:export_course',
+                     reverse('learning:export_course', args=[course.slug]))
+        url = reverse('learning:course_module_update', args=[course.pk])
+        user.request('learning:course_module_update', url)
+        user.request('learning:course_module_update', url, method='POST',
+                     data=self.get_formset_data(target), expected=(302,))
+
+        url = reverse('learning:module_content_create',
+                      args=[module.id, 'text'])
+        data = {'title': 'Benchmark', 'content': 'Benchmark text'}
+        user.request('learning:module_content_create', url)
+        user.request('learning:module_content_create', url, method='POST',
+                     data=data, expected=(302,))
+        content = Content.objects.filter(module=module).latest('id')
+        url = reverse('learning:module_content_update',
+                      args=[module.id, 'text', content.object_id])
+        user.request('learning:module_content_update', url)
+        user.request('learning:module_content_update', url, method='POST',
+                     data=data, expected=(302,))
+        self.delete_content(user, content)
+
+        body = b'benchmark upload\n'
+        status, response = user.request(
+            'learning:upload_create',
+            reverse('learning:upload_create', args=[module.id, 'file']),
+            method='POST',
+            data={'title': 'Benchmark', 'filename': 'benchmark.txt',
+                  'size': len(body)},
+            expected=(201,))
+        if status == 201:
+            upload = json.loads(response)
+            user.request('learning:upload_chunk', upload['url'],
+                         method='PUT', body=body,
+                         headers={'X-Upload-Offset': '0'})
+            user.request('learning:upload_chunk', upload['url'])
+            user.request('learning:upload_complete', upload['complete_url'],
+                         method='POST')
+            content = Content.objects.filter(module=module).latest('id')
+            user.request('learning:content_download',
+                         reverse('learning:content_download',
+                                 args=[content.id]),
+                         expected=(200, 302))
+            self.delete_content(user, content)
+
+        ids = [module.id for module in target['modules']]
+        user.request('learning:module_order',
+                     reverse('learning:module_order'), method='POST',
+                     body=json.dumps(ids).encode(),
+                     headers={'Content-Type': 'application/json'})
+        user.request('learning:content_order',
+                     reverse('learning:content_order'), method='POST',
+                     body=json.dumps(target['contents']).encode(),
+                     headers={'Content-Type': 'application/json'})
+        user.request('users:profile_edit',
+                     reverse('users:profile_edit', args=[target['profile']]))
+        user.request('users:register', reverse('users:register'))
+        SimulatedUser(user.base_url, user.recorder, user.timeout).request(
+            'users:default_log_in', reverse('users:default_log_in'),
+            expected=(302,))
+
+    def delete_content(self, user, content):
+        user.request('learning:module_content_delete',
+                     reverse('learning:module_content_delete',
+                             args=[content.id]),
+                     method='POST', expected=(302,))
+
+    def get_formset_data(self, target):
+        """
+        Returns module formset data, which keeps modules unchanged.
+        """
+        modules = target['modules']
+        data = {'modules-TOTAL_FORMS': len(modules),
+                'modules-INITIAL_FORMS': len(modules),
+                'modules-MIN_NUM_FORMS': 0,
+                'modules-MAX_NUM_FORMS': 1000}
+        for index, module in enumerate(modules):
+            prefix = 'modules-{}-'.format(index)
+            data.update({prefix + 'id': module.id,
+                         prefix + 'course': module.course_id,
+                         prefix + 'title': module.title,
+                         prefix + 'description': module.description,
+                         prefix + 'order': module.order})
+        return data
+
+    def report(self, summary, wall_time):
+        self.stdout.write('{:<44} {:>6} {:>5} {:>8} {:>8} {:>8} {:>7} {:>7}'
+                          .format('route', 'reqs', 'errs', 'p50 ms',
+                                  'p95 ms', 'p99 ms', 'req/s', 'queries'))
+        total = 0
+        for route, stats in summary.items():
+            total += stats['requests']
+            self.stdout.write(
+                '{:<44} {:>6} {:>5} {:>8.1f} {:>8.1f} {:>8.1f} {:>7.1f} '
+                '{:>7}'.format(
+                    route, stats['requests'], stats['errors'],
+                    stats['p50'], stats['p95'], stats['p99'], stats['rps'],
+                    '-' if stats['queries'] is None
+                    else '{:.1f}'.format(stats['queries'])))
+        self.stdout.write('{} requests in {:.1f} s, {:.1f} req/s'.format(
+            total, wall_time, total / wall_time))
+
+    def report_missing(self, summary):
+        """
+        Lists URLs of learning and users apps, which no scenario requested.
+        """
+        requested = {route.split(' ', 1)[1] for route in summary}
+        for name in get_url_names(learning_urls) + get_url_names(users_urls):
+            if name not in requested:
+                self.stdout.write(self.style.WARNING(
+                    '{} was not requested'.format(name)))
+
+    def compare(self, summary, baseline, options):
+        """
+        Fails if p95 latency or queries per request grew against
+        the baseline, or a route started failing.
+        """
+        regressions = []
+        for route, base in baseline.items():
+            stats = summary.get(route)
+            if stats is None:
+                self.stdout.write('{} missing from results'.format(route))
+                continue
+            if stats['p95'] > base['p95'] * (1 + options['tolerance']) \
+                    and stats['p95'] - base['p95'] > options['min_delta']:
+                regressions.append('{} p95 {:.1f} ms, was {:.1f} ms'.format(
+                    route, stats['p95'], base['p95']))
+            if stats['queries'] is not None and base['queries'] is not None \
+                    and stats['queries'] > base['queries']:
+                regressions.append('{} {:.1f} queries, was {:.1f}'.format(
+                    route, stats['queries'], base['queries']))
+            if stats['errors'] and not base['errors']:
+                regressions.append('{} {} errors'.format(route,
+                                                         stats['errors']))
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError('{} regressions against baseline'.format(
+                len(regressions)))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
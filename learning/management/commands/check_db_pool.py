@@ -0,0 +1,113 @@
+import math
+import threading
+import time
+
+import psycopg2
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from tutor.db_pool.base import DatabaseWrapper
+from tutor.db_pool.pool import WaitTimer, close_pools, wait_timer
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)), 1) - 1]
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that checks the connection pool against
+    the database: threads run queries concurrently, closing their
+    connections after every query, as requests do. Then an idle pooled
+    connection is terminated on the server, which the health check has
+    to notice. Reports waits for connections and pool statistics.
+    """
+    help = 'Checks pooled database connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--threads', type=int, default=16,
+                            help='Threads running queries at once')
+        parser.add_argument('--queries', type=int, default=50,
+                            help='Queries of every thread')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if not isinstance(connections[alias], DatabaseWrapper):
+            raise CommandError('Database {} does not use tutor.db_pool '
+                               'engine'.format(alias))
+        connections[alias].close()
+        close_pools()
+        waits, pids, errors = [], set(), []
+        lock = threading.Lock()
+
+        def run():
+            try:
+                for number in range(options['queries']):
+                    timer = WaitTimer()
+                    token = wait_timer.set(timer)
+                    try:
+                        pid = self.get_backend_pid(alias)
+                    finally:
+                        wait_timer.reset(token)
+                    with lock:
+                        waits.append(timer.duration)
+                        pids.add(pid)
+            except Exception as error:
+                with lock:
+                    errors.append(error)
+            finally:
+                connections[alias].close()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run)
+                   for number in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+        if errors:
+            raise CommandError('Queries failed: {}'.format(errors[0]))
+        pid = self.get_backend_pid(alias)
+        pool = connections[alias].pool
+        stats = pool.get_stats()
+        self.stdout.write('{} queries in {:.2f} s over {} connections, '
+                          'pool size {}'.format(
+                              len(waits), duration, len(pids),
+                              stats['max_size']))
+        self.stdout.write('Waits for connection: {} of {}, '
+                          'p50 {:.1f} ms, p95 {:.1f} ms, max {:.1f} ms'.format(
+                              stats['waited'], stats['acquired'],
+                              percentile(waits, 50) * 1000,
+                              percentile(waits, 95) * 1000,
+                              stats['max_wait'] * 1000))
+        if len(pids) > stats['max_size']:
+            raise CommandError('Pool opened more connections than its size')
+        with psycopg2.connect(
+                **connections[alias].get_connection_params()) as admin:
+            with admin.cursor() as cursor:
+                cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+        admin.close()
+        time.sleep(pool.check_interval + 0.1)
+        new_pid = self.get_backend_pid(alias)
+        if new_pid == pid:
+            raise CommandError('Terminated connection was reused')
+        self.stdout.write('Terminated connection replaced, failed health '
+                          'checks: {}'.format(
+                              pool.get_stats()['failed_checks']))
+        self.stdout.write(self.style.SUCCESS('Connection pool works'))
+
+    def get_backend_pid(self, alias):
+        """
+        Returns id of the server process of a pooled connection,
+        which is returned to the pool right after.
+        """
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                return cursor.fetchone()[0]
+        finally:
+            connection.close()
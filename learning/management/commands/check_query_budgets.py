@@ -0,0 +1,261 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import URLPattern, URLResolver, resolve, reverse
+
+from learning import urls as learning_urls
+from learning.models import (Content, Course, Enrollment, File, Image,
+                             Module, Subject, Text, Video)
+from learning.progress import buffer
+from learning.search import rebuild_index
+from tutor.querybudget import count_queries, get_query_budget
+from users import urls as users_urls
+
+
+ITEMS = [(Text, {'content': 'Text'}),
+         (Video, {'url': 'https://www.youtube.com/watch?v=budget'}),
+         (Image, {'image': 'images/query-budget.jpg'}),
+         (File, {'other_file': 'files/query-budget.pdf'})]
+
+
+class Rollback(Exception):
+    """
+    Raised to roll back data generated for a run.
+    """
+
+
+def get_url_names(urlconf):
+    """
+    Returns namespaced names of all URL patterns of the urlconf.
+    """
+    names = []
+    for pattern in urlconf.urlpatterns:
+        if isinstance(pattern, URLPattern) and pattern.name:
+            names.append('{}:{}'.format(urlconf.app_name, pattern.name))
+        elif isinstance(pattern, URLResolver):
+            names.extend(get_url_names(pattern.urlconf_module))
+    return names
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that checks query budgets of views.
+    Every URL of learning and users apps is requested twice, against
+    small and large generated data, inside of a transaction that is
+    rolled back. Progress events of the requests are dropped.
+    Fails if a view has no budget, goes over its budget or makes
+    more queries for more data, which points at N+1 queries.
+    """
+    help = 'Checks that views stay within their SQL query budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--small', type=int, default=2,
+                            help='Number of courses, modules per course '
+                                 'and contents per module in small data')
+        parser.add_argument('--large', type=int, default=6,
+                            help='The same for large data')
+
+    def handle(self, *args, **options):
+        if options['small'] >= options['large']:
+            raise CommandError('--small has to be lower than --large')
+        self.verbosity = options['verbosity']
+        names = get_url_names(learning_urls) + get_url_names(users_urls)
+        with override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                INTERNAL_IPS=[],
+                QUERY_BUDGET_RAISE=False,
+                PROGRESS_FLUSH_INTERVAL=None,
+                CACHES={'default': {
+                    'BACKEND':
+                        'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'query-budget'}}):
+            small = self.measure(names, options['small'])
+            large = self.measure(names, options['large'])
+        failures = []
+        for name in names:
+            if large[name] is None:
+                self.stdout.write('{:<40} skipped'.format(name))
+                continue
+            method, count, budget, queries = large[name]
+            problems = []
+            if budget is None:
+                problems.append('no budget')
+            elif count > budget:
+                problems.append('over budget')
+            if count > small[name][1]:
+                problems.append('grows with data from {}'.format(
+                    small[name][1]))
+            self.stdout.write('{:<40} {:<5} {:>3} / {:<4} {}'.format(
+                name, method.upper(), count,
+                '-' if budget is None else budget, ', '.join(problems)))
+            if problems:
+                failures.append(name)
+                if self.verbosity > 1:
+                    for sql in queries:
+                        self.stdout.write('    ' + sql)
+        if failures:
+            raise CommandError('{} views failed query budget: {}'.format(
+                len(failures), ', '.join(failures)))
+        self.stdout.write(self.style.SUCCESS('All views within budget'))
+
+    def measure(self, names, scale):
+        """
+        Returns method, query count, budget and queries of every URL,
+        or None for skipped URLs, measured against generated data.
+        """
+        results = {}
+        try:
+            with transaction.atomic():
+                data = self.generate(scale)
+                requests = self.get_requests(data)
+                for name in names:
+                    if name not in requests:
+                        raise CommandError(
+                            'No request defined for {}'.format(name))
+                    if requests[name] is None:
+                        results[name] = None
+                        continue
+                    results[name] = self.request(name, data['user'],
+                                                 *requests[name])
+                raise Rollback
+        except Rollback:
+            pass
+        return results
+
+    def request(self, name, user, method, kwargs, data=None, query=''):
+        """
+        Requests the URL as the user and returns method, query count,
+        budget and queries. Changes made by the request are rolled back.
+        Cache is cleared first, so budgets hold for cold caches too.
+        Streaming responses are read whole, so queries made while
+        their content is generated are counted.
+        """
+        url = reverse(name, kwargs=kwargs)
+        client = Client()
+        client.force_login(user)
+        cache.clear()
+        sid = transaction.savepoint()
+        try:
+            with count_queries() as counter:
+                if method == 'get':
+                    response = client.get(url + query)
+                else:
+                    response = client.post(url, data,
+                                           content_type='application/json')
+                if response.streaming:
+                    for chunk in response.streaming_content:
+                        pass
+        finally:
+            transaction.savepoint_rollback(sid)
+            buffer.clear()
+        if response.status_code >= 400:
+            raise CommandError('{} returned {}'.format(
+                name, response.status_code))
+        budget = get_query_budget(resolve(url).func, method)
+        return method, counter.count, budget, counter.queries
+
+    def generate(self, scale):
+        """
+        Creates teacher with scale courses, scale modules in every course
+        and scale contents of every item type in every module.
+        Teacher is enrolled in the first course.
+        """
+        user = get_user_model().objects.create_user(
+            username='query-budget', password='query-budget')
+        user.user_permissions.add(*Permission.objects.filter(
+            content_type__app_label='learning',
+            codename__in=['add_course', 'change_course', 'delete_course']))
+        subject = Subject.objects.create(title='Query budget',
+                                         slug='query-budget')
+        courses = Course.objects.bulk_create([
+            Course(owner=user, subject=subject,
+                   title='Budget course {}'.format(i),
+                   slug='query-budget-{}'.format(i),
+                   thumbnail='course_thumbnails/query-budget.jpg',
+                   overview='Generated course')
+            for i in range(scale)])
+        modules = Module.objects.bulk_create([
+            Module(course=course, title='Module {}'.format(i))
+            for course in courses for i in range(scale)])
+        items = []
+        for model, values in ITEMS:
+            objs = model.objects.bulk_create([
+                model(owner=user, title='{} {}'.format(model.__name__, i),
+                      **values)
+                for module in modules for i in range(scale)])
+            content_type = ContentType.objects.get_for_model(model)
+            items.extend((module, content_type, obj) for module, obj in zip(
+                [module for module in modules for i in range(scale)],
+                objs))
+        contents = Content.objects.bulk_create([
+            Content(module=module, content_type=content_type,
+                    object_id=obj.id)
+            for module, content_type, obj in items])
+        rebuild_index(Course.objects.filter(owner=user))
+        Enrollment.objects.create(user=user, course=courses[0])
+        return {'user': user, 'course': courses[0], 'module': modules[0],
+                'modules': modules[:scale], 'text': items[0][2],
+                'contents': [content for content in contents
+                             if content.module_id == modules[0].id]}
+
+    def get_requests(self, data):
+        """
+        Returns request made for every URL name, as method, URL kwargs,
+        POST data and query string. None skips the URL.
+        """
+        course, module = data['course'], data['module']
+        slug = data['user'].profile.slug
+        return {
+            'learning:dashboard': ('get', {}),
+            'learning:teacher_dashboard': ('get', {}),
+            'learning:create_course': ('get', {}),
+            'learning:delete_course': ('post', {'slug': course.slug}),
+            'learning:update_course': ('get', {'slug': course.slug}),
+            'learning:clone_course': ('post', {'slug': course.slug}),
+            'learning:import_course': ('get', {}),
+            'learning:export_course': ('get', {'slug': course.slug}),
+            'learning:search': ('get', {}, None, '?q=budget'),
+            'learning:detail_course': ('get', {'slug': course.slug}),
+            'learning:learning_view': ('get', {'slug': course.slug}),
+            'learning:enroll': ('post', {'slug': course.slug}),
+            'learning:module_learning': (
+                'get', {'slug': course.slug, 'module_id': module.id}),
+            'learning:complete_content': (
+                'post', {'id': data['contents'][0].id}),
+            'learning:course_module_update': ('get', {'pk': course.pk}),
+            'learning:module_content_create': (
+                'get', {'module_id': module.id, 'model_name': 'text'}),
+            'learning:module_content_update': (
+                'get', {'module_id': module.id, 'model_name': 'text',
+                        'id': data['text'].id}),
+            'learning:module_content_delete': (
+                'post', {'id': data['contents'][0].id}),
+            'learning:module_content_list': (
+                'get', {'module_id': module.id}),
+            'learning:module_order': (
+                'post', {},
+                json.dumps([obj.id for obj in reversed(data['modules'])])),
+            'learning:content_order': (
+                'post', {},
+                json.dumps([obj.id for obj in reversed(data['contents'])])),
+            # uploads and renditions write files to the storage
+            'learning:upload_create': None,
+            'learning:upload_chunk': None,
+            'learning:upload_complete': None,
+            'learning:rendition': None,
+            # files of generated items do not exist in the storage
+            'learning:content_download': None,
+            'users:login': ('get', {}),
+            'users:logout': ('get', {}),
+            'users:register': ('get', {}),
+            'users:profile': ('get', {'slug': slug}),
+            'users:profile_edit': ('get', {'slug': slug}),
+            # logs in the fixture user, who is not part of generated data
+            'users:default_log_in': None,
+        }
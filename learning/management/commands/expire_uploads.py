@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from learning.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that aborts abandoned uploads,
+    removing their partial files and parts of S3 multipart uploads.
+    Meant to run periodically, e.g. from cron.
+    """
+    help = 'Aborts pending uploads that were not continued'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='Age of uploads to abort, counted from '
+                                 'their last chunk')
+
+    def handle(self, *args, **options):
+        expired = expire_uploads(timedelta(hours=options['hours']))
+        self.stdout.write('Expired uploads: {}'.format(expired))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from learning.bundles import export_course
+from learning.models import Course
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that exports course bundle to a file.
+    """
+    help = 'Exports course with its modules, contents and media'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug', help='Slug of the course')
+        parser.add_argument('path', help='Path of the bundle file')
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(slug=options['slug']).first()
+        if course is None:
+            raise CommandError('Course {} does not exist'.format(
+                options['slug']))
+        with open(options['path'], 'wb') as file:
+            for chunk in export_course(course):
+                file.write(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            'Exported {} to {}'.format(course.slug, options['path'])))
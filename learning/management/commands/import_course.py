@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from learning.bundles import BundleError, import_course
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that imports course bundle from a file.
+    """
+    help = 'Imports course bundle as a course of the user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the bundle file')
+        parser.add_argument('--owner', required=True,
+                            help='Username of the course owner')
+
+    def handle(self, *args, **options):
+        owner = get_user_model().objects.filter(
+            username=options['owner']).first()
+        if owner is None:
+            raise CommandError('User {} does not exist'.format(
+                options['owner']))
+        try:
+            with open(options['path'], 'rb') as file:
+                course = import_course(file, owner)
+        except BundleError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {} as {}'.format(options['path'], course.slug)))
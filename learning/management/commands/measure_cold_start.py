@@ -0,0 +1,90 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter, like a newly started worker
+PROBE = '''
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import django
+django.setup()
+from django.contrib.auth import get_user_model
+from django.test import Client, override_settings
+
+from tutor.warmup import warm_up
+
+url, username, warm = sys.argv[1], sys.argv[2], sys.argv[3] == '1'
+client = Client()
+client.handler.load_middleware()
+setup = time.perf_counter() - start
+warm_up_time = 0
+if warm:
+    warm_up_start = time.perf_counter()
+    warm_up()
+    warm_up_time = time.perf_counter() - warm_up_start
+with override_settings(ALLOWED_HOSTS=['testserver'],
+                       QUERY_BUDGET_RAISE=False):
+    if username:
+        client.force_login(get_user_model().objects.get(username=username))
+    latencies = []
+    for number in range(2):
+        request_start = time.perf_counter()
+        response = client.get(url)
+        latencies.append(time.perf_counter() - request_start)
+json.dump({'setup': setup, 'warm_up': warm_up_time,
+           'first': latencies[0], 'second': latencies[1],
+           'status': response.status_code}, sys.stdout)
+'''
+
+PHASES = ('setup', 'warm_up', 'first', 'second', 'to_first')
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that measures cold start of a worker:
+    time from a fresh interpreter to the first response, with and without
+    warm-up. Every run starts a new process, which loads Django, warms up
+    or not, and requests the URL twice. Reports medians of the runs.
+    """
+    help = 'Measures time from worker start to first response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/login/',
+                            help='Path requested by the worker')
+        parser.add_argument('--user', default='',
+                            help='Username of user logged in for requests')
+        parser.add_argument('--runs', type=int, default=3,
+                            help='Started processes for each mode')
+
+    def handle(self, *args, **options):
+        self.stdout.write('{:<8}'.format('mode') + ''.join(
+            '{:>12}'.format(phase.replace('_', '-')) for phase in PHASES))
+        for mode, warm in (('cold', '0'), ('warm', '1')):
+            runs = [self.probe(options['url'], options['user'], warm)
+                    for number in range(options['runs'])]
+            for run in runs:
+                run['to_first'] = run['setup'] + run['warm_up'] + \
+                    run['first']
+            self.stdout.write('{:<8}'.format(mode) + ''.join(
+                '{:>9.1f} ms'.format(
+                    statistics.median(run[phase] for run in runs) * 1000)
+                for phase in PHASES))
+
+    def probe(self, url, username, warm):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, url, username, warm],
+            cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError('Worker failed:\n' + result.stderr)
+        timings = json.loads(result.stdout)
+        if timings['status'] >= 400:
+            raise CommandError('{} returned {}'.format(url,
+                                                       timings['status']))
+        return timings
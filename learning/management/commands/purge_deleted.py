@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from learning.deletion import (BATCH_SIZE, purge_deleted_courses,
+                               sweep_orphans)
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that purges deleted courses
+    and removes orphaned items with their files.
+    Meant to run periodically, e.g. from cron.
+    """
+    help = 'Purges deleted courses and orphaned items in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Number of rows deleted at once')
+        parser.add_argument('--grace-hours', type=int, default=24,
+                            help='Age of orphaned items to remove')
+        parser.add_argument('--no-sweep', action='store_true',
+                            help='Skip removing orphaned items')
+
+    def handle(self, *args, **options):
+        purged = purge_deleted_courses(options['batch_size'])
+        self.stdout.write('Purged courses: {}'.format(purged))
+        if options['no_sweep']:
+            return
+        deleted = sweep_orphans(options['batch_size'],
+                                timedelta(hours=options['grace_hours']))
+        for model_name, count in deleted.items():
+            self.stdout.write('Orphaned {} items removed: {}'.format(
+                model_name, count))
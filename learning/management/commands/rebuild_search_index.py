@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from learning.search import rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that indexes all courses for search.
+    Needed after rows were written without signals, e.g. by bulk_create.
+    """
+    help = 'Rebuilds full-text search index of courses'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            'Indexed {} courses'.format(count)))
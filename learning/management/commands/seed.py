@@ -0,0 +1,204 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from learning.models import (Content, Course, File, Image, Module, Subject,
+                             Text, Video)
+from learning.search import index_courses
+from users.models import DEFAULT_PICTURE, Profile
+
+USER_PREFIX = 'seed-user-'
+
+COURSE_PREFIX = 'seed-course-'
+
+SUBJECTS = ['Programming', 'Mathematics', 'Physics', 'Economics',
+            'Languages', 'Music', 'Design', 'History']
+
+LEVELS = ['Introduction to', 'Practical', 'Advanced', 'Modern',
+          'Applied', 'Fundamentals of', 'Mastering']
+
+TOPICS = ['Python', 'Django', 'Statistics', 'Algebra', 'Mechanics',
+          'Microeconomics', 'Spanish', 'Harmony', 'Typography',
+          'Databases', 'Networking', 'Calculus', 'Accounting',
+          'Photography', 'Marketing', 'Machine Learning']
+
+WORDS = ['learn', 'build', 'project', 'theory', 'practice', 'exercise',
+         'example', 'method', 'model', 'data', 'design', 'system',
+         'skill', 'problem', 'solution', 'lesson', 'test', 'review',
+         'concept', 'tool', 'analysis', 'structure', 'process', 'result']
+
+ITEM_MODELS = [Text, Video, Image, File]
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that seeds database with generated
+    users, profiles, subjects, courses, modules and contents.
+    Rows are written with bulk_create, so no signals are sent,
+    and search index is updated per batch.
+    Generated rows are counted by their name prefix, so seeding again
+    only adds what is missing and is nearly instant once done.
+    """
+    help = 'Seeds database with generated data for development ' \
+           'and performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100,
+                            help='Number of generated teachers')
+        parser.add_argument('--courses', type=int, default=1000,
+                            help='Number of generated courses')
+        parser.add_argument('--modules', type=int, default=5,
+                            help='Number of modules per course')
+        parser.add_argument('--contents', type=int, default=4,
+                            help='Number of contents per module')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of courses written at once')
+        parser.add_argument('--fixture',
+                            help='Fixture loaded first, '
+                                 'if database has no users yet')
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['fixture'] and not User.objects.exists():
+            call_command('loaddata', options['fixture'],
+                         verbosity=options['verbosity'])
+        self.random = random.Random(options['random_seed'])
+        self.batch_size = options['batch_size']
+        self.seed_users(options['users'])
+        self.seed_subjects()
+        owners = list(User.objects.filter(
+            username__startswith=USER_PREFIX).values_list('pk', flat=True)) \
+            or list(User.objects.values_list('pk', flat=True))
+        if options['courses'] and not owners:
+            raise CommandError('No users to own the courses')
+        self.seed_courses(options['courses'], owners,
+                          options['modules'], options['contents'])
+
+    def seed_users(self, total):
+        """
+        Creates teachers with profiles, up to total.
+        """
+        User = get_user_model()
+        existing = User.objects.filter(
+            username__startswith=USER_PREFIX).count()
+        if existing >= total:
+            return
+        password = make_password('seed')
+        group = Group.objects.filter(name='Teachers').first()
+        for start in range(existing, total, self.batch_size):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username='{}{:06d}'.format(USER_PREFIX, i),
+                         email='{}{:06d}@example.com'.format(USER_PREFIX, i),
+                         password=password)
+                    for i in range(start, min(start + self.batch_size,
+                                              total))])
+                Profile.objects.bulk_create([
+                    Profile(user=user,
+                            slug=slugify(user.username),
+                            profile_picture=DEFAULT_PICTURE,
+                            location=self.random.choice(
+                                ['Warsaw', 'Berlin', 'Lisbon', 'Oslo']))
+                    for user in users])
+                if group is not None:
+                    Membership = User.groups.through
+                    Membership.objects.bulk_create([
+                        Membership(user_id=user.pk, group_id=group.pk)
+                        for user in users])
+        self.stdout.write('Users: {}'.format(total))
+
+    def seed_subjects(self):
+        """
+        Creates subjects that do not exist yet.
+        """
+        existing = set(Subject.objects.values_list('slug', flat=True))
+        Subject.objects.bulk_create([
+            Subject(title=title, slug=slugify(title))
+            for title in SUBJECTS if slugify(title) not in existing])
+
+    def seed_courses(self, total, owners, modules, contents):
+        """
+        Creates courses with modules and contents of every item type,
+        up to total. Every batch is written in its own transaction,
+        so interrupted seeding resumes after the last complete batch.
+        """
+        existing = Course.objects.filter(
+            slug__startswith=COURSE_PREFIX).count()
+        if existing >= total:
+            self.stdout.write('Courses: {}, nothing to add'.format(total))
+            return
+        subjects = list(Subject.objects.values_list('pk', flat=True))
+        thumbnails = list(Course.objects.exclude(
+            slug__startswith=COURSE_PREFIX).exclude(
+            thumbnail='').values_list('thumbnail', flat=True)[:20]) or ['']
+        content_types = ContentType.objects.get_for_models(*ITEM_MODELS)
+        for start in range(existing, total, self.batch_size):
+            end = min(start + self.batch_size, total)
+            with transaction.atomic():
+                courses = Course.objects.bulk_create([
+                    self.make_course(i, owners, subjects, thumbnails)
+                    for i in range(start, end)])
+                module_objs = Module.objects.bulk_create([
+                    Module(course=course, order=order,
+                           title='{} {}'.format(self.sentence(2).title(),
+                                                order + 1),
+                           description=self.sentence(12))
+                    for course in courses for order in range(modules)])
+                items = {model: [] for model in ITEM_MODELS}
+                placed = []
+                for module in module_objs:
+                    for order in range(contents):
+                        model = ITEM_MODELS[order % len(ITEM_MODELS)]
+                        item = self.make_item(model, module.course.owner_id)
+                        items[model].append(item)
+                        placed.append((module, order, model, item))
+                for model, objs in items.items():
+                    model.objects.bulk_create(objs,
+                                              batch_size=self.batch_size)
+                Content.objects.bulk_create([
+                    Content(module=module, order=order,
+                            content_type=content_types[model],
+                            object_id=item.pk)
+                    for module, order, model, item in placed],
+                    batch_size=self.batch_size)
+                index_courses([course.pk for course in courses])
+            self.stdout.write('Courses: {} / {}'.format(end, total))
+
+    def sentence(self, length):
+        return ' '.join(self.random.choices(WORDS, k=length))
+
+    def make_course(self, index, owners, subjects, thumbnails):
+        title = '{} {}'.format(self.random.choice(LEVELS),
+                               self.random.choice(TOPICS))
+        return Course(owner_id=self.random.choice(owners),
+                      subject_id=self.random.choice(subjects),
+                      title=title,
+                      slug='{}{:07d}'.format(COURSE_PREFIX, index),
+                      thumbnail=self.random.choice(thumbnails),
+                      overview=self.sentence(40).capitalize() + '.',
+                      status=self.random.choice(['Draft', 'Published']))
+
+    def make_item(self, model, owner_id):
+        """
+        Returns unsaved item of the model. Files of images and files
+        are placeholders, which do not exist in the storage.
+        """
+        item = model(owner_id=owner_id, title=self.sentence(3).capitalize())
+        if model is Text:
+            item.content = self.sentence(80)
+        elif model is Video:
+            item.url = 'https://www.youtube.com/watch?v=seed{}'.format(
+                self.random.randrange(10 ** 6))
+        elif model is Image:
+            item.image = 'images/seed.jpg'
+        elif model is File:
+            item.other_file = 'files/seed.pdf'
+        return item
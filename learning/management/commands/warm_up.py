@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from tutor.warmup import warm_up
+
+
+class Command(BaseCommand):
+    """
+    A class to represent command that runs warm-up of the process
+    and reports time of every step. Gunicorn workers run the same
+    warm-up before they accept traffic.
+    """
+    help = 'Compiles templates and primes caches of the process'
+
+    def handle(self, *args, **options):
+        timings = warm_up()
+        for name, seconds in timings:
+            self.stdout.write('{:<20} {:>8.1f} ms'.format(name,
+                                                          seconds * 1000))
+        self.stdout.write('{:<20} {:>8.1f} ms'.format(
+            'total', sum(seconds for name, seconds in timings) * 1000))
@@ -0,0 +1,58 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:13
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Creates GIN index on PostgreSQL and FTS5 table on SQLite,
+    then indexes existing courses.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX learning_course_search_vector_gin '
+            'ON learning_course USING gin (search_vector)')
+        schema_editor.execute(
+            "UPDATE learning_course SET search_vector = "
+            "setweight(to_tsvector('english', title), 'A') || "
+            "setweight(to_tsvector('english', coalesce(("
+            "SELECT string_agg(title, ' ') FROM learning_module "
+            "WHERE learning_module.course_id = learning_course.id), '')), 'B') || "
+            "setweight(to_tsvector('english', overview), 'C')")
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE learning_course_fts USING fts5('
+            "title, modules, overview, tokenize='porter unicode61')")
+        schema_editor.execute(
+            'INSERT INTO learning_course_fts(rowid, title, modules, overview) '
+            "SELECT id, title, coalesce((SELECT group_concat(title, ' ') "
+            'FROM learning_module '
+            'WHERE learning_module.course_id = learning_course.id), \'\'), '
+            'overview FROM learning_course')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS learning_course_search_vector_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS learning_course_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0001_squashed_0007_alter_content_created_alter_content_order_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
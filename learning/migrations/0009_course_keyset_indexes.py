@@ -0,0 +1,21 @@
+# Generated by Django 4.1.7 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0008_course_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['-created', '-id'], name='learning_co_created_ba76c0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['owner', '-created', '-id'], name='learning_co_owner_i_fc735d_idx'),
+        ),
+    ]
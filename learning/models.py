@@ -1,9 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Prefetch
 
-from .fields import OrderField
+from .fields import OrderField, OrderQuerySet
 
 
 class Subject(models.Model):
@@ -37,6 +39,54 @@ class TimeStampMixin(models.Model):
         abstract = True
     
 
+class CourseQuerySet(models.QuerySet):
+    """
+    A class to represent queryset of courses.
+    """
+    def with_tree(self):
+        """
+        Prefetches modules, their contents and content items,
+        so the whole course tree is loaded with a fixed number of queries.
+        """
+        return self.prefetch_related(
+            Prefetch('modules',
+                     queryset=Module.objects.with_contents()))
+
+    def available_to(self, user):
+        """
+        Returns published courses and courses of the user,
+        which the user is allowed to see.
+        """
+        if not user.is_authenticated:
+            return self.filter(status='Published')
+        return self.filter(models.Q(status='Published') |
+                           models.Q(owner=user))
+
+    def unique_slug(self, slug):
+        """
+        Returns the slug, or the slug with the lowest free number
+        appended to it, if the slug is taken. Costs one query.
+        """
+        max_length = self.model._meta.get_field('slug').max_length
+        slug = slug[:max_length - 5].strip('-')
+        taken = set(self.filter(slug__startswith=slug).order_by()
+                    .values_list('slug', flat=True))
+        candidate, number = slug, 1
+        while candidate in taken:
+            number += 1
+            candidate = '{}-{}'.format(slug, number)
+        return candidate
+
+
+class CourseManager(models.Manager.from_queryset(CourseQuerySet)):
+    """
+    A class to represent manager of courses, which are not deleted.
+    """
+    def get_queryset(self):
+        return super(CourseManager, self).get_queryset().filter(
+            deleted_at__isnull=True)
+
+
 class Course(TimeStampMixin):
     """
     A class to represent courses.
@@ -52,6 +102,9 @@ class Course(TimeStampMixin):
     overview : basic info about the course
     created : when the course was created
     status : status of the course, to choose from the STATUS_CHOICES
+    search_vector : full-text search document, maintained by learning.search
+    deleted_at : when the course was deleted, its rows are purged
+                 in background by learning.deletion
     """
 
     STATUS_CHOICES = (
@@ -73,14 +126,37 @@ class Course(TimeStampMixin):
     status = models.CharField(max_length=10,
                             choices=STATUS_CHOICES,
                             default='Draft')
+    search_vector = SearchVectorField(null=True, editable=False)
+    deleted_at = models.DateTimeField(null=True, blank=True,
+                                      editable=False, db_index=True)
+
+    objects = CourseManager()
+    all_objects = CourseQuerySet.as_manager()
     
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['-created', '-id']),
+            models.Index(fields=['owner', '-created', '-id']),
+        ]
         
     def __str__(self):
         return self.title
     
 
+class ModuleQuerySet(OrderQuerySet):
+    """
+    A class to represent queryset of modules.
+    """
+    def with_contents(self):
+        """
+        Prefetches contents of the modules together with their items.
+        """
+        return self.prefetch_related(
+            Prefetch('contents',
+                     queryset=Content.objects.with_items()))
+
+
 class Module(TimeStampMixin):
     """
     A class to represent module
@@ -98,6 +174,8 @@ class Module(TimeStampMixin):
     title = models.CharField(max_length=150)
     description = models.TextField(blank=True)
     order = OrderField(blank=True, for_fields=['course'])
+
+    objects = ModuleQuerySet.as_manager()
     
     class Meta:
         ordering = ['order']
@@ -106,6 +184,19 @@ class Module(TimeStampMixin):
         return '{}. {}'.format(self.order, self.title)
     
 
+class ContentQuerySet(OrderQuerySet):
+    """
+    A class to represent queryset of contents.
+    """
+    def with_items(self):
+        """
+        Prefetches generic items of the contents.
+        Contents are grouped by content type, so all Text, Video,
+        Image and File items are loaded with one query per type.
+        """
+        return self.prefetch_related('item')
+
+
 class Content(TimeStampMixin):
     """
     A class to represent content
@@ -133,10 +224,80 @@ class Content(TimeStampMixin):
     item = GenericForeignKey('content_type', 'object_id')
     order = OrderField(blank=True, for_fields=['module'])
 
+    objects = ContentQuerySet.as_manager()
+
     class Meta:
         ordering = ['order']
 
 
+class Enrollment(TimeStampMixin):
+    """
+    A class to represent enrollment of a student in a course.
+
+    Attributes:
+    -----------
+    user : enrolled student
+    course : course the student learns
+    completed : number of completed contents of the course,
+                maintained by learning.progress when progress is flushed
+    """
+    user = models.ForeignKey(get_user_model(),
+                             related_name='enrollments',
+                             on_delete=models.CASCADE)
+    course = models.ForeignKey(Course,
+                               related_name='enrollments',
+                               on_delete=models.CASCADE)
+    completed = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'],
+                                    name='unique_enrollment'),
+        ]
+
+    def __str__(self):
+        return '{} in {}'.format(self.user, self.course)
+
+
+class ContentProgress(TimeStampMixin):
+    """
+    A class to represent progress of an enrolled student on a content.
+    Rows are written in batches by learning.progress.
+
+    Attributes:
+    -----------
+    enrollment : enrollment of the student
+    content : viewed or completed content
+    status : status of the content, to choose from the STATUS_CHOICES
+    completed_at : when the content was completed
+    """
+
+    VIEWED = 'viewed'
+    COMPLETED = 'completed'
+
+    STATUS_CHOICES = (
+        (VIEWED, 'Viewed'),
+        (COMPLETED, 'Completed')
+    )
+
+    enrollment = models.ForeignKey(Enrollment,
+                                   related_name='progress',
+                                   on_delete=models.CASCADE)
+    content = models.ForeignKey(Content,
+                                related_name='progress',
+                                on_delete=models.CASCADE)
+    status = models.CharField(max_length=10,
+                              choices=STATUS_CHOICES,
+                              default=VIEWED)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['enrollment', 'content'],
+                                    name='unique_content_progress'),
+        ]
+
+
 class ItemBase(TimeStampMixin):
     """
     Abstract class to represent different type items
@@ -201,4 +362,53 @@ class File(ItemBase):
     -----------
     file : text content of item
     """
-    other_file = models.FileField(upload_to='files')
\ No newline at end of file
+    other_file = models.FileField(upload_to='files')
+
+
+class Upload(TimeStampMixin):
+    """
+    A class to represent chunked, resumable upload of a file item.
+
+    Attributes:
+    -----------
+    owner : user uploading the file
+    module : module that content is added to on completion
+    model_name : type of the item, file or image
+    title : title of the item
+    name : storage name of the uploaded file
+    size : total size of the file in bytes
+    offset : number of bytes received so far
+    upload_id : id of S3 multipart upload
+    parts : ETags of uploaded S3 parts
+    status : status of the upload, to choose from the STATUS_CHOICES
+    """
+
+    MODEL_CHOICES = (
+        ('file', 'file'),
+        ('image', 'image')
+    )
+
+    STATUS_CHOICES = (
+        ('Pending', 'Pending'),
+        ('Complete', 'Complete')
+    )
+
+    owner = models.ForeignKey(get_user_model(),
+                              related_name='uploads',
+                              on_delete=models.CASCADE)
+    module = models.ForeignKey(Module,
+                               related_name='uploads',
+                               on_delete=models.CASCADE)
+    model_name = models.CharField(max_length=10, choices=MODEL_CHOICES)
+    title = models.CharField(max_length=250)
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    upload_id = models.CharField(max_length=1024, blank=True)
+    parts = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10,
+                              choices=STATUS_CHOICES,
+                              default='Pending')
+
+    def __str__(self):
+        return self.title
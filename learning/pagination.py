@@ -0,0 +1,196 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class CursorPage(object):
+    """
+    A class to represent a page of cursor paginator.
+
+    Attributes:
+    -----------
+    object_list : objects on the page
+    paginator : paginator that made the page
+    next_cursor : cursor of the next page, None on the last page
+    previous_cursor : cursor of the previous page, None on the first page
+    """
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator(object):
+    """
+    A class to represent keyset paginator.
+    Pages are selected with a condition on ordering fields of the last
+    seen object, instead of OFFSET, so deep pages cost the same as the
+    first one. Ordering has to be unique, e.g. end with the primary key.
+
+    Attributes:
+    -----------
+    queryset : paginated queryset
+    per_page : number of objects on the page
+    ordering : ordering fields, '-' prefix for descending order
+    count_mode : None to skip counting, 'exact' or 'estimate'
+    """
+    is_cursor = True
+
+    def __init__(self, queryset, per_page, ordering=('-created', '-id'),
+                 count_mode=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = ordering
+        self.count_mode = count_mode
+
+    @cached_property
+    def fields(self):
+        """
+        Returns pairs of model field and descending flag for ordering.
+        """
+        opts = self.queryset.model._meta
+        return [(opts.get_field(name.lstrip('-')), name.startswith('-'))
+                for name in self.ordering]
+
+    @cached_property
+    def count(self):
+        """
+        Returns total number of objects, estimated or exact,
+        depending on count_mode. Returns None if counting is off.
+        """
+        if self.count_mode is None:
+            return None
+        if self.count_mode == 'estimate':
+            return self.estimate_count()
+        return self.queryset.count()
+
+    def estimate_count(self):
+        """
+        Returns number of rows estimated by PostgreSQL planner.
+        Other databases count exactly.
+        """
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return self.queryset.count()
+        plan = json.loads(self.queryset.explain(format='json'))
+        return plan[0]['Plan']['Plan Rows']
+
+    def encode_cursor(self, obj, direction):
+        """
+        Returns cursor pointing at the object.
+        """
+        values = []
+        for field, descending in self.fields:
+            value = getattr(obj, field.attname)
+            values.append(value.isoformat()
+                          if hasattr(value, 'isoformat') else value)
+        data = json.dumps([direction, values]).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, cursor):
+        """
+        Returns direction and ordering values stored in the cursor.
+        """
+        try:
+            direction, values = json.loads(base64.urlsafe_b64decode(cursor))
+            if direction not in ('next', 'previous'):
+                raise ValueError
+            values = [field.to_python(value)
+                      for (field, descending), value
+                      in zip(self.fields, values, strict=True)]
+        except (binascii.Error, ValidationError, TypeError, ValueError):
+            raise Http404('Invalid cursor')
+        return direction, values
+
+    def get_condition(self, values, forward):
+        """
+        Returns condition selecting objects after the values in
+        ordering, or before them if forward is False.
+        """
+        condition = Q()
+        for index, (field, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{'{}__{}'.format(field.attname, lookup):
+                        values[index]})
+            for (previous, _), value in zip(self.fields[:index], values):
+                step &= Q(**{previous.attname: value})
+            condition |= step
+        return condition
+
+    def page(self, cursor=None):
+        """
+        Returns page that the cursor points at, first page if no cursor.
+        """
+        queryset = self.queryset
+        forward = True
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            forward = direction == 'next'
+            queryset = queryset.filter(self.get_condition(values, forward))
+        if forward:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = queryset.order_by(*[
+                name[1:] if name.startswith('-') else '-' + name
+                for name in self.ordering])
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if not forward:
+            object_list.reverse()
+        has_next = has_more if forward else True
+        has_previous = bool(cursor) if forward else has_more
+        next_cursor = previous_cursor = None
+        if object_list and has_next:
+            next_cursor = self.encode_cursor(object_list[-1], 'next')
+        if object_list and has_previous:
+            previous_cursor = self.encode_cursor(object_list[0], 'previous')
+        return CursorPage(object_list, self, next_cursor, previous_cursor)
+
+
+class CursorPaginationMixin(object):
+    """
+    A mixin for list views, which replaces offset pagination
+    with cursor pagination.
+
+    Attributes:
+    -----------
+    cursor_kwarg : name of query parameter with the cursor
+    cursor_ordering : ordering of the list, has to be unique
+    count_mode : None to skip counting, 'exact' or 'estimate'
+    """
+    cursor_kwarg = 'cursor'
+    cursor_ordering = ('-created', '-id')
+    count_mode = None
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginates the queryset with CursorPaginator.
+        """
+        paginator = CursorPaginator(queryset, page_size,
+                                    ordering=self.cursor_ordering,
+                                    count_mode=self.count_mode)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
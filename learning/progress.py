@@ -0,0 +1,220 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from tutor.tasks import submit
+
+from .cache import get_content_count
+from .models import Content, ContentProgress, Enrollment
+
+logger = logging.getLogger(__name__)
+
+VIEWED = ContentProgress.VIEWED
+
+COMPLETED = ContentProgress.COMPLETED
+
+
+def recount_enrollments(enrollments):
+    """
+    Sets completed counters of the enrollments to the number of their
+    completed contents, with one query. Counting, rather than adding,
+    keeps counters right when workers flush events of the same student.
+    """
+    completed = (ContentProgress.objects
+                 .filter(enrollment=OuterRef('pk'), status=COMPLETED)
+                 .order_by().values('enrollment')
+                 .annotate(count=Count('pk')).values('count'))
+    return enrollments.update(completed=Coalesce(Subquery(completed), 0))
+
+
+def recount_course(course_id):
+    """
+    Recounts completed contents of students of the course,
+    e.g. after a content was deleted.
+    """
+    recount_enrollments(Enrollment.objects.filter(course_id=course_id))
+
+
+class ProgressBuffer(object):
+    """
+    A class to represent progress events of a single process, which are
+    written in batches instead of one write per click.
+    Events are keyed by enrollment and content, so repeated views of a
+    content are one row, and completion is never turned back into view.
+    Buffer is flushed in background once it holds PROGRESS_BATCH_SIZE
+    events or its oldest event is PROGRESS_FLUSH_INTERVAL seconds old,
+    and when gunicorn worker exits. Events of deleted enrollments and
+    contents are dropped, events of a failed flush are put back and
+    written by the next one.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.events = {}
+        self.flushing = {}
+        self.scheduled = False
+        self.timer = None
+
+    def record(self, enrollment_id, content_id, status):
+        key = (enrollment_id, content_id)
+        with self.lock:
+            if self.events.get(key, (None,))[0] != COMPLETED:
+                self.events[key] = (status, timezone.now())
+            if len(self.events) >= getattr(settings, 'PROGRESS_BATCH_SIZE',
+                                           500):
+                schedule = not self.scheduled
+                self.scheduled = True
+            else:
+                schedule = False
+                self.start_timer()
+        if schedule:
+            submit(self.flush)
+
+    def start_timer(self):
+        """
+        Starts timer flushing the buffer, unless it runs already.
+        Called with the lock held.
+        """
+        interval = getattr(settings, 'PROGRESS_FLUSH_INTERVAL', 5)
+        if self.timer is not None or not interval:
+            return
+        self.timer = threading.Timer(interval, submit, [self.flush])
+        self.timer.daemon = True
+        self.timer.start()
+
+    def get_pending(self, enrollment_id):
+        """
+        Returns statuses of contents of the enrollment, which the process
+        recorded but did not write yet, keyed by content id.
+        """
+        with self.lock:
+            return {content_id: status
+                    for events in (self.flushing, self.events)
+                    for (pk, content_id), (status, time) in events.items()
+                    if pk == enrollment_id}
+
+    def clear(self):
+        """
+        Drops events which were not written yet and returns them.
+        """
+        with self.lock:
+            events, self.events = self.events, {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        return events
+
+    def flush(self):
+        """
+        Writes buffered events and returns their number.
+        """
+        with self.flush_lock:
+            with self.lock:
+                events, self.events = self.events, {}
+                self.flushing = events
+                self.scheduled = False
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+            try:
+                if events:
+                    try:
+                        self.write(events)
+                    except IntegrityError:
+                        self.write(self.get_existing(events))
+            except Exception:
+                logger.exception('Flush of %s progress events failed',
+                                 len(events))
+                with self.lock:
+                    for key, event in events.items():
+                        if self.events.get(key, (None,))[0] != COMPLETED:
+                            self.events[key] = event
+                    self.start_timer()
+                return 0
+            finally:
+                with self.lock:
+                    self.flushing = {}
+        return len(events)
+
+    def get_existing(self, events):
+        """
+        Returns those of the events, whose enrollment and content exist.
+        Students leave courses and teachers delete contents
+        while their events wait in the buffer.
+        """
+        enrollment_ids = set(Enrollment.objects.filter(
+            pk__in={key[0] for key in events}).values_list('pk', flat=True))
+        content_ids = set(Content.objects.filter(
+            pk__in={key[1] for key in events}).values_list('pk', flat=True))
+        return {key: event for key, event in events.items()
+                if key[0] in enrollment_ids and key[1] in content_ids}
+
+    def write(self, events):
+        """
+        Inserts views, skipping contents with progress, and upserts
+        completions, with one query each. Then recounts completed
+        contents of enrollments with new completions.
+        Rows are sorted, so concurrent flushes lock them in one order.
+        """
+        viewed, completed = [], []
+        for (enrollment_id, content_id), (status, time) in sorted(
+                events.items()):
+            if status == COMPLETED:
+                completed.append(ContentProgress(
+                    enrollment_id=enrollment_id, content_id=content_id,
+                    status=COMPLETED, completed_at=time))
+            else:
+                viewed.append(ContentProgress(
+                    enrollment_id=enrollment_id, content_id=content_id,
+                    status=VIEWED))
+        with transaction.atomic():
+            ContentProgress.objects.bulk_create(viewed,
+                                                ignore_conflicts=True)
+            if completed:
+                ContentProgress.objects.bulk_create(
+                    completed,
+                    update_conflicts=True,
+                    unique_fields=['enrollment', 'content'],
+                    update_fields=['status', 'completed_at', 'updated'])
+                recount_enrollments(Enrollment.objects.filter(
+                    pk__in={obj.enrollment_id for obj in completed}))
+
+
+buffer = ProgressBuffer()
+
+
+def record(enrollment, content_id, status):
+    """
+    Records progress of the enrollment on the content.
+    """
+    buffer.record(enrollment.pk, content_id, status)
+
+
+def get_statuses(enrollment, statuses):
+    """
+    Returns statuses of contents of the enrollment read from the database,
+    updated with events of the process, which were not written yet.
+    """
+    statuses = dict(statuses)
+    for content_id, status in buffer.get_pending(enrollment.pk).items():
+        if statuses.get(content_id) != COMPLETED:
+            statuses[content_id] = status
+    return statuses
+
+
+def get_completion(enrollment):
+    """
+    Returns percentage of contents of the course the student completed.
+    Completions the process did not write yet are counted in.
+    """
+    total = get_content_count(enrollment.course_id)
+    if not total:
+        return 0
+    pending = list(buffer.get_pending(enrollment.pk).values())
+    completed = enrollment.completed + pending.count(COMPLETED)
+    return min(100, round(completed * 100 / total))
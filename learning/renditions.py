@@ -0,0 +1,149 @@
+import hashlib
+import os
+from io import BytesIO
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+RENDITIONS_DIR = 'renditions'
+
+FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+SIGNING_SALT = 'learning.renditions'
+
+# Redirects are cached briefly, templates link to stored renditions anyway
+REDIRECT_MAX_AGE = 60 * 5
+
+
+def get_rendition_name(name, digest, width, height, fmt):
+    """
+    Returns deterministic storage name of the rendition, derived from
+    source name, digest of source content, size and format.
+    A new file stored under name of a deleted one gets new renditions,
+    so renditions can be cached forever.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return '{}/{}/{}-{}-{}x{}.{}'.format(RENDITIONS_DIR, digest[:2], stem,
+                                         digest[:12], width, height, fmt)
+
+
+def get_cache_key(name):
+    """
+    Returns cache key of renditions made of the source file,
+    stored as names of renditions keyed by spec.
+    """
+    return 'learning:renditions:{}'.format(
+        hashlib.sha1(name.encode()).hexdigest())
+
+
+def get_spec(width, height, fmt):
+    return '{}x{}.{}'.format(width, height, fmt)
+
+
+def remember_rendition(name, spec, rendition_name):
+    renditions = cache.get(get_cache_key(name)) or {}
+    renditions[spec] = rendition_name
+    cache.set(get_cache_key(name), renditions, None)
+
+
+def forget_renditions(names):
+    """
+    Forgets renditions of the source files, e.g. after the files were
+    deleted, so templates link files stored under their names later
+    to the view making new renditions.
+    """
+    cache.delete_many([get_cache_key(name) for name in names if name])
+
+
+def make_token(name, width, height, fmt):
+    """
+    Returns signed token of rendition parameters,
+    so only sizes requested by templates can be generated.
+    """
+    signer = signing.Signer(salt=SIGNING_SALT)
+    return signer.sign_object([name, width, height, fmt])
+
+
+def read_token(token):
+    """
+    Returns rendition parameters from the token.
+    Raises signing.BadSignature if token was tampered with.
+    """
+    signer = signing.Signer(salt=SIGNING_SALT)
+    name, width, height, fmt = signer.unsign_object(token)
+    if fmt not in FORMATS:
+        raise signing.BadSignature('Unknown format')
+    return name, int(width), int(height), fmt
+
+
+def render(name, width, height, fmt, storage=default_storage):
+    """
+    Makes the rendition of the source image and saves it in the storage,
+    unless it already exists. Returns storage name of the rendition.
+    Source is read whole, as its digest is a part of the name.
+    """
+    with storage.open(name) as source:
+        data = source.read()
+    digest = hashlib.sha1(data).hexdigest()
+    rendition_name = get_rendition_name(name, digest, width, height, fmt)
+    if not storage.exists(rendition_name):
+        img = Image.open(BytesIO(data))
+        img = ImageOps.exif_transpose(img)
+        img = ImageOps.fit(img, (width, height), Image.LANCZOS)
+        if FORMATS[fmt] == 'JPEG' and img.mode != 'RGB':
+            img = img.convert('RGB')
+        img_io = BytesIO()
+        img.save(img_io, FORMATS[fmt], quality=80)
+        saved_name = storage.save(rendition_name,
+                                  ContentFile(img_io.getvalue()))
+        if saved_name != rendition_name:
+            # Concurrent request saved the rendition first
+            storage.delete(saved_name)
+    remember_rendition(name, get_spec(width, height, fmt), rendition_name)
+    return rendition_name
+
+
+def get_urls(image, specs, storage=default_storage):
+    """
+    Returns URLs of renditions of the image field file,
+    one for every (width, height, format) spec.
+    URL points straight at the storage once the rendition was made,
+    otherwise at the view that makes it.
+    Cache is checked with one lookup for all of the specs.
+    """
+    if not image:
+        return ['' for spec in specs]
+    made = cache.get(get_cache_key(image.name)) or {}
+    urls = []
+    for width, height, fmt in specs:
+        name = made.get(get_spec(int(width), int(height), fmt))
+        if name:
+            urls.append(storage.url(name))
+        else:
+            urls.append(reverse('learning:rendition', args=[
+                make_token(image.name, int(width), int(height), fmt)]))
+    return urls
+
+
+def get_url(image, width, height, fmt='jpeg'):
+    """
+    Returns URL of the rendition of the image field file.
+    """
+    return get_urls(image, [(width, height, fmt)])[0]
+
+
+def get_srcset(image, width, height, fmt='jpeg', densities=(1, 2)):
+    """
+    Returns srcset of renditions for given pixel densities.
+    """
+    urls = get_urls(image, [(int(width) * density, int(height) * density, fmt)
+                            for density in densities])
+    return ', '.join('{} {}x'.format(url, density)
+                     for url, density in zip(urls, densities))
@@ -0,0 +1,173 @@
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from .models import Course, Module
+
+SEARCH_CONFIG = 'english'
+
+FTS_TABLE = 'learning_course_fts'
+
+
+def get_module_titles(course):
+    """
+    Returns titles of course modules joined into one document.
+    """
+    return ' '.join(course.modules.values_list('title', flat=True))
+
+
+def index_course(course):
+    """
+    Updates search document of a single course.
+    Indexes title, module titles and overview, weighted in that order.
+    """
+    modules = get_module_titles(course)
+    if connection.vendor == 'postgresql':
+        vector = (
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(Value(modules, output_field=TextField()),
+                           weight='B', config=SEARCH_CONFIG)
+            + SearchVector('overview', weight='C', config=SEARCH_CONFIG))
+        Course.objects.filter(pk=course.pk).update(search_vector=vector)
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE),
+                [course.pk])
+            cursor.execute(
+                'INSERT INTO {}(rowid, title, modules, overview) '
+                'VALUES (%s, %s, %s, %s)'.format(FTS_TABLE),
+                [course.pk, course.title, modules, course.overview])
+
+
+def index_course_by_id(course_id):
+    """
+    Updates search document of the course, if it still exists.
+    """
+    course = Course.objects.filter(pk=course_id).first()
+    if course is not None:
+        index_course(course)
+
+
+def unindex_course(course_id):
+    """
+    Removes deleted course from the SQLite index.
+    On PostgreSQL the document is deleted together with the row.
+    """
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE),
+                [course_id])
+
+
+def index_courses(pks):
+    """
+    Updates search documents of courses with the primary keys,
+    with a constant number of queries.
+    """
+    if connection.vendor == 'postgresql':
+        modules = Module.objects.filter(course=OuterRef('pk')).order_by() \
+            .values('course').annotate(titles=StringAgg('title', ' ')) \
+            .values('titles')
+        vector = (
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(Coalesce(Subquery(modules,
+                                             output_field=TextField()),
+                                    Value(''), output_field=TextField()),
+                           weight='B', config=SEARCH_CONFIG)
+            + SearchVector('overview', weight='C', config=SEARCH_CONFIG))
+        Course.objects.filter(pk__in=pks).update(search_vector=vector)
+    elif connection.vendor == 'sqlite':
+        placeholders = ', '.join(['%s'] * len(pks))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {} WHERE rowid IN ({})'.format(FTS_TABLE,
+                                                           placeholders),
+                pks)
+            cursor.execute(
+                'INSERT INTO {}(rowid, title, modules, overview) '
+                'SELECT id, title, coalesce(('
+                "SELECT group_concat(title, ' ') FROM learning_module "
+                'WHERE learning_module.course_id = learning_course.id), \'\'), '
+                'overview FROM learning_course WHERE id IN ({})'.format(
+                    FTS_TABLE, placeholders),
+                pks)
+
+
+def rebuild_index(queryset=None, batch_size=500):
+    """
+    Indexes all courses of the queryset in batches.
+    Returns number of courses.
+    """
+    queryset = queryset if queryset is not None else Course.objects.all()
+    count = 0
+    pks = []
+    for pk in queryset.order_by('pk').values_list('pk', flat=True).iterator(
+            chunk_size=batch_size):
+        pks.append(pk)
+        if len(pks) == batch_size:
+            index_courses(pks)
+            count += len(pks)
+            pks = []
+    if pks:
+        index_courses(pks)
+        count += len(pks)
+    return count
+
+
+def get_match(query):
+    """
+    Converts user input to FTS5 query, which matches all of the words.
+    Words are quoted, so FTS5 syntax in the input is not interpreted.
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join('"{}"'.format(word) for word in words)
+
+
+def filter_courses(queryset, query):
+    """
+    Restricts course queryset to courses matching the query.
+    """
+    if connection.vendor == 'postgresql':
+        return queryset.filter(
+            search_vector=SearchQuery(query,
+                                      search_type='websearch',
+                                      config=SEARCH_CONFIG))
+    if connection.vendor == 'sqlite':
+        match = get_match(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            'SELECT rowid FROM {} WHERE {} MATCH %s'.format(FTS_TABLE,
+                                                            FTS_TABLE),
+            [match]))
+    return queryset.filter(Q(title__icontains=query)
+                           | Q(overview__icontains=query))
+
+
+def search_courses(queryset, query):
+    """
+    Returns courses matching the query, ordered by relevance.
+    """
+    queryset = filter_courses(queryset, query)
+    if connection.vendor == 'postgresql':
+        rank = SearchRank(F('search_vector'),
+                          SearchQuery(query,
+                                      search_type='websearch',
+                                      config=SEARCH_CONFIG))
+    elif connection.vendor == 'sqlite' and get_match(query):
+        # bm25() is lower for better matches, weights follow column order
+        rank = RawSQL(
+            '(SELECT -bm25({0}, 10.0, 4.0, 1.0) FROM {0} '
+            'WHERE {0} MATCH %s AND {0}.rowid = {1}.id)'.format(
+                FTS_TABLE, connection.ops.quote_name(Course._meta.db_table)),
+            [get_match(query)])
+    else:
+        return queryset
+    return queryset.annotate(rank=rank).order_by('-rank', '-created')
@@ -0,0 +1,78 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tutor.cache import bump_version
+from tutor.tasks import submit
+
+from .cache import SUBJECTS_VERSION_KEY, bump_course_version
+from .models import Content, Course, Module, Subject
+from .progress import recount_course
+from .search import index_course_by_id, unindex_course
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def invalidate_subjects(sender, instance, **kwargs):
+    """
+    Invalidates cached subjects after a subject is saved or deleted.
+    """
+    bump_version(SUBJECTS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_course(sender, instance, raw=False, **kwargs):
+    """
+    Invalidates cached course fragments after the course or one of its
+    modules changes. Fragments hold title and slug of the course.
+    """
+    if raw:
+        return
+    bump_course_version(instance.pk if sender is Course
+                        else instance.course_id)
+
+
+@receiver(post_save, sender=Content)
+def invalidate_content_count(sender, instance, created, raw=False, **kwargs):
+    """
+    Invalidates cached content count of the course after a content
+    is added. Deleted contents are handled by ContentDeleteView,
+    a receiver of post_delete would disable fast deletes of contents.
+    """
+    if created and not raw:
+        bump_course_version(instance.module.course_id)
+
+
+@receiver(post_delete, sender=Module)
+def recount_completions(sender, instance, **kwargs):
+    """
+    Recounts completed contents of students of the course after a module
+    is deleted, since progress on its contents is deleted with it.
+    """
+    transaction.on_commit(partial(submit, recount_course, instance.course_id))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def index_course(sender, instance, raw=False, **kwargs):
+    """
+    Updates search document of the course after the course or
+    one of its modules changes.
+    """
+    if raw:
+        return
+    course_id = instance.pk if sender is Course else instance.course_id
+    transaction.on_commit(partial(index_course_by_id, course_id))
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course_on_delete(sender, instance, **kwargs):
+    """
+    Removes deleted course from search index.
+    """
+    unindex_course(instance.pk)
@@ -1,4 +1,8 @@
 from django import template
+from django.db import DEFAULT_DB_ALIAS
+
+from learning.cache import get_course_version
+from learning.progress import get_completion
 
 register = template.Library()
 
@@ -10,4 +14,43 @@ def model_name(obj):
     try:
         return obj._meta.model_name
     except AttributeError:
-        return None
\ No newline at end of file
+        return None
+
+
+@register.simple_tag(takes_context=True)
+def query_string(context, **kwargs):
+    """
+    Template tag to get current query string with replaced parameters
+    """
+    query = context['request'].GET.copy()
+    for key, value in kwargs.items():
+        if value is None or value == '':
+            query.pop(key, None)
+        else:
+            query[key] = value
+    return query.urlencode()
+
+
+@register.simple_tag
+def course_version(course):
+    """
+    Template tag to get version of course modules for fragment cache keys
+    """
+    return get_course_version(course.id)
+
+
+@register.simple_tag
+def course_modules(course):
+    """
+    Template tag to get modules of the course for cached fragments,
+    read from the primary, as replicas may lag behind
+    """
+    return course.modules.using(DEFAULT_DB_ALIAS)
+
+
+@register.simple_tag
+def completion(enrollment):
+    """
+    Template tag to get completion percentage of the enrollment
+    """
+    return get_completion(enrollment)
@@ -0,0 +1,43 @@
+from django import template
+
+from learning.renditions import get_srcset, get_url, get_urls
+
+register = template.Library()
+
+
+@register.simple_tag
+def rendition(image, width, height, fmt='jpeg'):
+    """
+    Template tag to get URL of image resized to width and height
+    """
+    return get_url(image, width, height, fmt)
+
+
+@register.simple_tag
+def rendition_srcset(image, width, height, fmt='jpeg'):
+    """
+    Template tag to get srcset of image resized to width and height
+    """
+    return get_srcset(image, width, height, fmt)
+
+
+@register.inclusion_tag('learning/includes/picture.html')
+def picture(image, width, height, css_class='', alt=''):
+    """
+    Template tag to render picture with WebP and JPEG renditions
+    """
+    width, height = int(width), int(height)
+    webp, webp_2x, jpeg, jpeg_2x = get_urls(image, [
+        (width, height, 'webp'),
+        (width * 2, height * 2, 'webp'),
+        (width, height, 'jpeg'),
+        (width * 2, height * 2, 'jpeg'),
+    ])
+    return {'image': image,
+            'webp_srcset': '{} 1x, {} 2x'.format(webp, webp_2x),
+            'src': jpeg,
+            'srcset': '{} 1x, {} 2x'.format(jpeg, jpeg_2x),
+            'width': width,
+            'height': height,
+            'css_class': css_class,
+            'alt': alt}
@@ -1,3 +1,594 @@
-from django.test import TestCase
+import io
+import json
+import os
+import posixpath
+import shutil
+import tarfile
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.http import Http404
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from .bundles import (BUNDLE_FORMAT, MANIFEST, MEDIA_DIR, RECORDS_DIR,
+                      BundleError, export_course, import_course)
+from .cloning import clone_course
+from .deletion import purge_batch
+from .downloads import LocalDownloadBackend, parse_range
+from .models import (Content, ContentProgress, Course, Enrollment, Image,
+                     Module, Subject, Text, Video)
+from .pagination import CursorPaginator
+from .progress import VIEWED, buffer
+from .renditions import forget_renditions, get_urls, render
+
+# Templates are rendered without collectstatic and its manifest
+STATIC_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+LOCAL_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_course(owner, slug='course', **kwargs):
+    """
+    Creates published course of the owner with a subject.
+    """
+    subject, created = Subject.objects.get_or_create(title='Subject',
+                                                     slug='subject')
+    kwargs.setdefault('status', 'Published')
+    return Course.objects.create(owner=owner, subject=subject, title=slug,
+                                 slug=slug, overview='Overview', **kwargs)
+
+
+def create_text(module, title='Text'):
+    """
+    Creates content of the module with a text item.
+    """
+    item = Text.objects.create(owner=module.course.owner, title=title,
+                               content='Content')
+    return Content.objects.create(module=module, item=item)
+
+
+def create_items(module, storage=None):
+    """
+    Creates contents of the module with a text, a video and,
+    if storage is given, an image stored in it.
+    """
+    owner = module.course.owner
+    items = [Video.objects.create(owner=owner, title='Video',
+                                  url='https://example.com/video')]
+    if storage is not None:
+        items.append(Image.objects.create(
+            owner=owner, title='Image',
+            image=storage.save('images/image.png', make_image('red'))))
+    return [create_text(module)] + [
+        Content.objects.create(module=module, item=item) for item in items]
+
+
+def add_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def build_bundle(records, media=()):
+    """
+    Returns file object of a bundle with the records and media,
+    given as pairs of name and data.
+    """
+    bundle = io.BytesIO()
+    with tarfile.open(fileobj=bundle, mode='w:gz') as tar:
+        add_member(tar, MANIFEST,
+                   json.dumps({'format': BUNDLE_FORMAT}).encode())
+        for name, data in media:
+            add_member(tar, MEDIA_DIR + name, data)
+        add_member(tar, RECORDS_DIR + '000000.ndjson', b''.join(
+            json.dumps(record).encode() + b'\n' for record in records))
+    bundle.seek(0)
+    return bundle
+
+
+def course_record(**kwargs):
+    record = {'type': 'course', 'title': 'Imported', 'slug': 'imported',
+              'overview': 'Overview', 'status': 'Published',
+              'thumbnail': '',
+              'subject': {'title': 'Subject', 'slug': 'subject'}}
+    record.update(kwargs)
+    return record
+
+
+class BundleTestCase(TestCase):
+    """
+    A class to represent tests of bundles, with media stored
+    in a temporary directory.
+    """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.storage = FileSystemStorage(location=self.media_root)
+        self.owner = get_user_model().objects.create_user('teacher')
+
+    def import_bundle(self, records, media=()):
+        return import_course(build_bundle(records, media), self.owner,
+                             self.storage)
+
+
+class MalformedBundleTests(BundleTestCase):
+    """
+    A class to represent tests of import of malformed bundles,
+    which fail with BundleError and leave nothing behind.
+    """
+    def assertRejected(self, records, media=()):
+        with self.assertRaises(BundleError):
+            self.import_bundle(records, media)
+        self.assertFalse(Course.all_objects.filter(
+            owner=self.owner).exists())
+        self.assertFalse(Text.objects.exists())
+
+    def test_item_without_fields(self):
+        self.assertRejected([
+            course_record(),
+            {'type': 'module', 'id': 1, 'title': 'One', 'description': '',
+             'order': 0},
+            {'type': 'content', 'module': 1, 'order': 0, 'model': 'text',
+             'item': {}}])
+
+    def test_invalid_item_value(self):
+        self.assertRejected([
+            course_record(),
+            {'type': 'module', 'id': 1, 'title': 'One', 'description': '',
+             'order': 0},
+            {'type': 'content', 'module': 1, 'order': 0, 'model': 'video',
+             'item': {'title': 'Video', 'url': 'not a url'}}])
+
+    def test_module_rejected_by_database(self):
+        self.assertRejected([
+            course_record(),
+            {'type': 'module', 'id': 1, 'title': None, 'description': '',
+             'order': 0}])
+
+    def test_unknown_status(self):
+        self.assertRejected([course_record(status='Hidden')])
+
+
+class ImportMediaTests(BundleTestCase):
+    """
+    A class to represent tests of media stored by import.
+    """
+    def test_media_stored_in_import_directory(self):
+        name = 'renditions/ab/picture-0123456789-100x100.webp'
+        course = self.import_bundle([course_record(thumbnail=name)],
+                                    [(name, b'data')])
+        self.assertRegex(course.thumbnail.name,
+                         r'^imports/[0-9a-f]{32}/picture-0123456789-100x100'
+                         r'\.webp$')
+        self.assertFalse(self.storage.exists(name))
+
+    def test_media_leaving_import_directory(self):
+        name = '../../renditions/ab/picture-0123456789-100x100.webp'
+        course = self.import_bundle([course_record(thumbnail=name)],
+                                    [(name, b'data')])
+        self.assertEqual(os.listdir(self.media_root), ['imports'])
+        self.assertEqual(posixpath.basename(course.thumbnail.name),
+                         posixpath.basename(name))
+
+    def test_long_media_name(self):
+        name = 'images/{}.png'.format('a' * 90)
+        course = self.import_bundle([course_record(thumbnail=name)],
+                                    [(name, b'data')])
+        self.assertLessEqual(len(course.thumbnail.name), 100)
+        self.assertTrue(self.storage.exists(course.thumbnail.name))
+
+
+class BundleRoundTripTests(BundleTestCase):
+    """
+    A class to represent tests of courses exported and imported back.
+    """
+    def describe(self, course):
+        return [(content.module.title, content.module.order, content.order,
+                 type(content.item).__name__, content.item.title)
+                for content in Content.objects.filter(
+                    module__course=course).order_by(
+                    'module__order', 'order')]
+
+    def test_course_imported_from_its_export(self):
+        course = create_course(self.owner, thumbnail=self.storage.save(
+            'thumbnails/course.png', make_image('blue')))
+        for title in ('One', 'Two'):
+            create_items(Module.objects.create(course=course, title=title),
+                         self.storage)
+        other = get_user_model().objects.create_user('other')
+        imported = import_course(
+            io.BytesIO(b''.join(export_course(course, self.storage))),
+            other, self.storage)
+        self.assertEqual((imported.title, imported.overview,
+                          imported.status, imported.subject),
+                         (course.title, course.overview, course.status,
+                          course.subject))
+        self.assertNotEqual(imported.slug, course.slug)
+        self.assertEqual(self.describe(imported), self.describe(course))
+        for content in Content.objects.filter(module__course=imported):
+            self.assertEqual(content.item.owner, other)
+        names = [imported.thumbnail.name] + [
+            image.image.name
+            for image in Image.objects.filter(owner=other).order_by('id')]
+        originals = [course.thumbnail.name] + [
+            image.image.name
+            for image in Image.objects.filter(
+                owner=self.owner).order_by('id')]
+        self.assertEqual(len(names), 3)
+        for name, original in zip(names, originals):
+            self.assertTrue(name.startswith('imports/'))
+            with self.storage.open(name) as file, \
+                    self.storage.open(original) as original_file:
+                self.assertEqual(file.read(), original_file.read())
+
+
+def make_image(color, size=(40, 30)):
+    data = io.BytesIO()
+    PILImage.new('RGB', size, color).save(data, 'PNG')
+    return ContentFile(data.getvalue())
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RenditionTests(TestCase):
+    """
+    A class to represent tests of image renditions.
+    """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.storage = FileSystemStorage(location=self.media_root,
+                                         base_url='/media/')
+        self.addCleanup(cache.clear)
+        self.name = self.storage.save('images/picture.png',
+                                      make_image('red'))
+
+    def get_url(self):
+        return get_urls(File(None, self.name), [(20, 10, 'jpeg')],
+                        self.storage)[0]
+
+    def test_url_of_made_rendition(self):
+        self.assertFalse(self.get_url().startswith('/media/'))
+        rendition_name = render(self.name, 20, 10, 'jpeg', self.storage)
+        self.assertEqual(self.get_url(), self.storage.url(rendition_name))
+        with self.storage.open(rendition_name) as rendition:
+            self.assertEqual(PILImage.open(rendition).size, (20, 10))
+
+    def test_new_file_under_deleted_name(self):
+        old = render(self.name, 20, 10, 'jpeg', self.storage)
+        self.storage.delete(self.name)
+        forget_renditions([self.name])
+        self.assertEqual(self.storage.save(self.name, make_image('blue')),
+                         self.name)
+        self.assertNotEqual(self.get_url(), self.storage.url(old))
+        new = render(self.name, 20, 10, 'jpeg', self.storage)
+        self.assertNotEqual(new, old)
+        self.assertEqual(self.get_url(), self.storage.url(new))
+
+
+@override_settings(STATICFILES_STORAGE=STATIC_STORAGE,
+                   BACKGROUND_TASKS=False, PROGRESS_BATCH_SIZE=1,
+                   PROGRESS_FLUSH_INTERVAL=None)
+class ModuleLearningViewTests(TestCase):
+    """
+    A class to represent tests of module learning view.
+    """
+    def setUp(self):
+        User = get_user_model()
+        self.course = create_course(User.objects.create_user('teacher'))
+        self.module = Module.objects.create(course=self.course, title='One')
+        self.content = create_text(self.module)
+        self.student = User.objects.create_user('student')
+        self.enrollment = Enrollment.objects.create(user=self.student,
+                                                    course=self.course)
+        self.client.force_login(self.student)
+
+    def tearDown(self):
+        buffer.clear()
+
+    def test_views_are_written_inline(self):
+        """
+        A full batch flushed inside the request is written, e.g. when
+        background tasks are disabled.
+        """
+        response = self.client.get(reverse(
+            'learning:module_learning',
+            args=[self.course.slug, self.module.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(ContentProgress.objects.filter(
+            enrollment=self.enrollment, content=self.content,
+            status=VIEWED).exists())
+
+
+class ParseRangeTests(SimpleTestCase):
+    """
+    A class to represent tests of Range header parsing.
+    """
+    def test_ranges(self):
+        for header, byte_range in [('bytes=0-99', (0, 99)),
+                                   ('bytes=500-', (500, 999)),
+                                   ('bytes=900-5000', (900, 999)),
+                                   ('bytes=999-999', (999, 999)),
+                                   ('bytes=-100', (900, 999)),
+                                   ('bytes=-5000', (0, 999))]:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 1000), byte_range)
+
+    def test_ignored_headers(self):
+        for header in [None, '', 'bytes=-', 'bytes=0-1,5-6', 'items=0-1',
+                       'bytes=a-b', 'bytes = 0-1']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+    def test_unsatisfiable_ranges(self):
+        for header, size in [('bytes=1000-', 1000), ('bytes=1000-1001', 1000),
+                             ('bytes=5-4', 1000), ('bytes=-0', 1000),
+                             ('bytes=0-', 0)]:
+            with self.subTest(header=header, size=size):
+                with self.assertRaises(ValueError):
+                    parse_range(header, size)
+
+
+class LocalDownloadTests(SimpleTestCase):
+    """
+    A class to represent tests of files streamed by Django,
+    without SENDFILE_HEADER.
+    """
+    etag = '"1-400"'
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.data = bytes(range(256)) * 4
+        self.path = os.path.join(directory, 'file.bin')
+        with open(self.path, 'wb') as file:
+            file.write(self.data)
+        self.backend = LocalDownloadBackend(
+            FileSystemStorage(location=directory))
+
+    def stream(self, size=None, **headers):
+        request = RequestFactory().get('/', **headers)
+        return self.backend.stream(
+            request, self.path, len(self.data) if size is None else size,
+            self.etag)
+
+    def assertContent(self, response, data):
+        self.assertEqual(b''.join(response.streaming_content), data)
+        self.assertEqual(response['Content-Length'], str(len(data)))
+
+    def test_whole_file(self):
+        response = self.stream()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Range', response)
+        self.assertContent(response, self.data)
+
+    def test_byte_range(self):
+        response = self.stream(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertContent(response, self.data[100:200])
+
+    def test_suffix_range(self):
+        response = self.stream(HTTP_RANGE='bytes=-24')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertContent(response, self.data[-24:])
+
+    def test_current_if_range(self):
+        response = self.stream(HTTP_RANGE='bytes=0-9',
+                               HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertContent(response, self.data[:10])
+
+    def test_stale_if_range(self):
+        response = self.stream(HTTP_RANGE='bytes=0-9',
+                               HTTP_IF_RANGE='"0-400"')
+        self.assertEqual(response.status_code, 200)
+        self.assertContent(response, self.data)
+
+    def test_unsatisfiable_range(self):
+        response = self.stream(HTTP_RANGE='bytes=1024-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_empty_file(self):
+        response = self.stream(size=0)
+        self.assertEqual(response.status_code, 200)
+        self.assertContent(response, b'')
+
+
+class CursorPaginatorTests(TestCase):
+    """
+    A class to represent tests of keyset pagination of courses.
+    """
+    def setUp(self):
+        owner = get_user_model().objects.create_user('teacher')
+        for number in range(5):
+            create_course(owner, slug='course-{}'.format(number))
+        self.paginator = CursorPaginator(Course.objects.all(), 2)
+
+    def get_expected(self):
+        return list(Course.objects.order_by('-created', '-id'))
+
+    def walk_forward(self):
+        pages = [self.paginator.page()]
+        while pages[-1].has_next():
+            pages.append(self.paginator.page(pages[-1].next_cursor))
+        return pages
+
+    def test_pages_follow_ordering(self):
+        pages = self.walk_forward()
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([course for page in pages for course in page],
+                         self.get_expected())
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+    def test_previous_pages(self):
+        pages = self.walk_forward()
+        previous = [pages[-1]]
+        while previous[-1].has_previous():
+            previous.append(self.paginator.page(
+                previous[-1].previous_cursor))
+        self.assertEqual([list(page) for page in reversed(previous)],
+                         [list(page) for page in pages])
+
+    def test_ties_broken_by_id(self):
+        Course.objects.update(created=timezone.now())
+        pages = self.walk_forward()
+        self.assertEqual([course for page in pages for course in page],
+                         self.get_expected())
+
+    def test_invalid_cursor(self):
+        # Not base64, JSON without values, unknown direction
+        for cursor in ['garbage', 'WyJuZXh0Il0=', 'WyJ1cCIsIFsxXV0=']:
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(Http404):
+                    self.paginator.page(cursor)
+
+    def test_count(self):
+        self.assertIsNone(self.paginator.count)
+        self.assertEqual(CursorPaginator(Course.objects.all(), 2,
+                                         count_mode='exact').count, 5)
+
+
+class ReorderTests(TestCase):
+    """
+    A class to represent tests of reordering of modules.
+    """
+    def setUp(self):
+        owner = get_user_model().objects.create_user('teacher')
+        course = create_course(owner)
+        self.modules = [Module.objects.create(course=course, title=title)
+                        for title in ('One', 'Two', 'Three')]
+        self.other = Module.objects.create(
+            course=create_course(owner, slug='other'), title='Other')
+
+    def get_titles(self):
+        return list(Module.objects.filter(
+            course=self.modules[0].course_id).order_by(
+            'order').values_list('title', flat=True))
+
+    def test_reorder(self):
+        one, two, three = self.modules
+        with self.assertNumQueries(2):
+            changed = Module.objects.reorder([three.pk, one.pk, two.pk])
+        self.assertEqual(len(changed), 3)
+        self.assertEqual(self.get_titles(), ['Three', 'One', 'Two'])
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.order, 0)
+
+    def test_only_changed_objects_updated(self):
+        one, two, three = self.modules
+        changed = Module.objects.reorder([one.pk, three.pk, two.pk])
+        self.assertEqual({module.pk for module in changed},
+                         {two.pk, three.pk})
+        self.assertEqual(self.get_titles(), ['One', 'Three', 'Two'])
+
+    def test_missing_sibling(self):
+        one, two, three = self.modules
+        with self.assertRaises(ValueError):
+            Module.objects.reorder([two.pk, one.pk])
+        self.assertEqual(self.get_titles(), ['One', 'Two', 'Three'])
+
+    def test_repeated_object(self):
+        one, two, three = self.modules
+        with self.assertRaises(ValueError):
+            Module.objects.reorder([one.pk, one.pk, two.pk, three.pk])
+
+
+class CloneCourseTests(TestCase):
+    """
+    A class to represent tests of course cloning.
+    """
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user('teacher')
+
+    def create_course(self, slug, modules):
+        course = create_course(self.owner, slug=slug)
+        for number in range(modules):
+            create_items(Module.objects.create(
+                course=course, title='Module {}'.format(number)))
+        return course
+
+    def count_queries(self, course):
+        with CaptureQueriesContext(connection) as queries:
+            clone_course(course)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_course(self):
+        self.assertEqual(self.count_queries(self.create_course('small', 1)),
+                         self.count_queries(self.create_course('large', 5)))
+
+    def test_clone(self):
+        course = self.create_course('course', 2)
+        other = get_user_model().objects.create_user('other')
+        clone = clone_course(course, other)
+        self.assertEqual((clone.owner, clone.status, clone.title),
+                         (other, 'Draft', 'course (copy)'))
+        contents = list(Content.objects.filter(
+            module__course=clone).order_by('module__order', 'order'))
+        originals = list(Content.objects.filter(
+            module__course=course).order_by('module__order', 'order'))
+        self.assertEqual(
+            [(c.module.title, c.order, c.item.title) for c in contents],
+            [(c.module.title, c.order, c.item.title) for c in originals])
+        for content, original in zip(contents, originals):
+            self.assertNotEqual(content.item.pk, original.item.pk)
+            self.assertEqual(content.item.owner, other)
+
+
+@override_settings(CACHES=LOCAL_CACHES, BACKGROUND_TASKS=False)
+class PurgeBatchTests(TestCase):
+    """
+    A class to represent tests of batched purge of deleted courses.
+    """
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.storage = FileSystemStorage(location=self.media_root)
+        self.addCleanup(cache.clear)
+        User = get_user_model()
+        self.course = create_course(User.objects.create_user('teacher'))
+        contents = create_items(Module.objects.create(
+            course=self.course, title='One'), self.storage)
+        create_items(Module.objects.create(course=self.course, title='Two'))
+        self.image = contents[-1].item.image.name
+        enrollment = Enrollment.objects.create(
+            user=User.objects.create_user('student'), course=self.course)
+        ContentProgress.objects.create(enrollment=enrollment,
+                                       content=contents[0], status=VIEWED)
+        Course.all_objects.filter(pk=self.course.pk).update(
+            deleted_at=timezone.now(),
+            slug='_deleted-{}'.format(self.course.pk))
+
+    def purge(self):
+        batches = 0
+        with override_settings(MEDIA_ROOT=self.media_root), \
+                self.captureOnCommitCallbacks(execute=True):
+            while purge_batch(self.course.pk, batch_size=2):
+                batches += 1
+        return batches
+
+    def test_rows_and_files_purged_in_batches(self):
+        # Progress, enrollment, 5 contents by 2 and 2 modules
+        self.assertEqual(self.purge(), 6)
+        self.assertFalse(Course.all_objects.filter(
+            pk=self.course.pk).exists())
+        for model in (ContentProgress, Enrollment, Module, Content, Text,
+                      Video, Image):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertFalse(self.storage.exists(self.image))
+
+    def test_files_of_copies_kept(self):
+        clone_course(Course.all_objects.get(pk=self.course.pk))
+        self.purge()
+        self.assertTrue(self.storage.exists(self.image))
@@ -0,0 +1,244 @@
+import logging
+import mimetypes
+import os
+import shutil
+from contextlib import contextmanager
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import FileField
+from django.utils import timezone
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from .models import Upload
+
+logger = logging.getLogger(__name__)
+
+# S3 requires every part but the last to be at least 5 MB
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+CHUNK_LOCK_KEY = 'learning:upload:{}:lock'
+
+# Longest time a chunk may take, the lock is released after it anyway
+CHUNK_LOCK_TIMEOUT = 60 * 10
+
+
+class UploadError(Exception):
+    """
+    Raised when a chunk does not continue the upload.
+    """
+
+
+def get_chunk_size():
+    """
+    Returns size of chunks that clients should send.
+    """
+    return max(getattr(settings, 'UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024),
+               S3_MIN_PART_SIZE)
+
+
+@contextmanager
+def chunk_lock(upload):
+    """
+    Lets one chunk of the upload be written at a time, without holding
+    a database lock while the chunk is transferred.
+    Raises UploadError if another chunk is being written.
+    """
+    key = CHUNK_LOCK_KEY.format(upload.pk)
+    if not cache.add(key, True, CHUNK_LOCK_TIMEOUT):
+        raise UploadError('Another chunk is being written')
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+class LimitedStream(object):
+    """
+    A class to represent file-like view of the first bytes of a stream.
+    """
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+class LocalUploadBackend(object):
+    """
+    A class to represent uploads to local file system storage.
+    Chunks are appended straight to the target file.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+
+    def start(self, upload):
+        """
+        Creates empty target file. Name of the upload is changed
+        if another upload took it in the meantime.
+        """
+        while True:
+            path = self.storage.path(upload.name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                open(path, 'xb').close()
+                return
+            except FileExistsError:
+                upload.name = self.storage.get_available_name(upload.name)
+
+    def get_offset(self, upload):
+        """
+        Returns number of bytes written, which may include
+        part of a chunk that was interrupted.
+        """
+        return os.path.getsize(self.storage.path(upload.name))
+
+    def write(self, upload, offset, stream, length):
+        """
+        Appends chunk read from the stream to the file.
+        """
+        if offset != self.get_offset(upload):
+            raise UploadError('Chunk does not continue the upload')
+        with open(self.storage.path(upload.name), 'ab') as target:
+            shutil.copyfileobj(LimitedStream(stream, length), target)
+        return self.get_offset(upload)
+
+    def complete(self, upload):
+        pass
+
+    def abort(self, upload):
+        self.storage.delete(upload.name)
+
+
+class S3UploadBackend(object):
+    """
+    A class to represent uploads to S3 storage.
+    Every chunk is sent as a part of S3 multipart upload.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+        self.client = storage.connection.meta.client
+
+    def get_key(self, upload):
+        return self.storage._normalize_name(clean_name(upload.name))
+
+    def get_params(self, upload):
+        params = self.storage.get_object_parameters(upload.name)
+        params.setdefault('ContentType',
+                          mimetypes.guess_type(upload.name)[0]
+                          or 'application/octet-stream')
+        return params
+
+    def start(self, upload):
+        """
+        Starts S3 multipart upload.
+        """
+        response = self.client.create_multipart_upload(
+            Bucket=self.storage.bucket_name,
+            Key=self.get_key(upload),
+            **self.get_params(upload))
+        upload.upload_id = response['UploadId']
+
+    def get_offset(self, upload):
+        return upload.offset
+
+    def write(self, upload, offset, stream, length):
+        """
+        Uploads chunk read from the stream as the next part.
+        """
+        if offset != upload.offset:
+            raise UploadError('Chunk does not continue the upload')
+        if length < S3_MIN_PART_SIZE and offset + length < upload.size:
+            raise UploadError('Chunk is too small')
+        body = stream.read(length)
+        if len(body) != length:
+            raise UploadError('Chunk was interrupted')
+        response = self.client.upload_part(
+            Bucket=self.storage.bucket_name,
+            Key=self.get_key(upload),
+            UploadId=upload.upload_id,
+            PartNumber=len(upload.parts) + 1,
+            Body=body)
+        upload.parts.append(response['ETag'])
+        return offset + len(body)
+
+    def complete(self, upload):
+        """
+        Joins uploaded parts into the target object.
+        Multipart upload needs at least one part, so empty files
+        are put as a single object.
+        """
+        if not upload.parts:
+            self.abort(upload)
+            self.client.put_object(Bucket=self.storage.bucket_name,
+                                   Key=self.get_key(upload),
+                                   Body=b'',
+                                   **self.get_params(upload))
+            return
+        self.client.complete_multipart_upload(
+            Bucket=self.storage.bucket_name,
+            Key=self.get_key(upload),
+            UploadId=upload.upload_id,
+            MultipartUpload={'Parts': [
+                {'ETag': etag, 'PartNumber': number}
+                for number, etag in enumerate(upload.parts, start=1)]})
+
+    def abort(self, upload):
+        """
+        Aborts S3 multipart upload, which removes its uploaded parts.
+        """
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=self.storage.bucket_name,
+                Key=self.get_key(upload),
+                UploadId=upload.upload_id)
+        except ClientError as error:
+            if error.response['Error']['Code'] != 'NoSuchUpload':
+                raise
+
+
+def get_file_field(model):
+    """
+    Returns file field of the item model.
+    """
+    return next(field for field in model._meta.concrete_fields
+                if isinstance(field, FileField))
+
+
+def get_backend(storage=default_storage):
+    """
+    Returns upload backend matching the storage.
+    """
+    if isinstance(storage, S3Boto3Storage):
+        return S3UploadBackend(storage)
+    return LocalUploadBackend(storage)
+
+
+def expire_uploads(age, storage=default_storage):
+    """
+    Aborts pending uploads not continued for age, removing their partial
+    files and S3 parts, and deletes them. Returns number of them.
+    """
+    backend = get_backend(storage)
+    uploads = Upload.objects.filter(status='Pending',
+                                    updated__lt=timezone.now() - age)
+    expired = 0
+    for upload in uploads.iterator():
+        try:
+            backend.abort(upload)
+        except Exception:
+            logger.exception('Abort of upload %s failed', upload.pk)
+            continue
+        upload.delete()
+        expired += 1
+    return expired
@@ -23,6 +23,22 @@ urlpatterns = [
          views.CourseUpdateView.as_view(), 
          name='update_course'),
 
+     path('teacher/clone_course/<str:slug>',
+          views.CourseCloneView.as_view(),
+          name='clone_course'),
+
+     path('teacher/import_course',
+          views.CourseImportView.as_view(),
+          name='import_course'),
+
+     path('teacher/export_course/<str:slug>',
+          views.CourseExportView.as_view(),
+          name='export_course'),
+
+     path('search/',
+          views.CourseSearchView.as_view(),
+          name='search'),
+
      path('course/overview/<str:slug>/',
           views.CourseDetailView.as_view(),
           name='detail_course'),
@@ -31,6 +47,18 @@ urlpatterns = [
           views.LearningView.as_view(),
           name='learning_view'),
 
+     path('course/learning/<str:slug>/enroll/',
+          views.EnrollView.as_view(),
+          name='enroll'),
+
+     path('course/learning/<str:slug>/module/<int:module_id>/',
+          views.ModuleLearningView.as_view(),
+          name='module_learning'),
+
+     path('content/<int:id>/complete/',
+          views.ContentCompleteView.as_view(),
+          name='complete_content'),
+
      path('course/formset/<str:pk>/',
           views.CourseModuleUpdateView.as_view(),
           name='course_module_update'),
@@ -39,10 +67,14 @@ urlpatterns = [
           views.ContentCreateUpdateView.as_view(),
           name='module_content_create'),
 
-     path('module/<int:module_id>/content/<module_name>/<id>',
+     path('module/<int:module_id>/content/<model_name>/<id>',
          views.ContentCreateUpdateView.as_view(),
          name='module_content_update'),
 
+     path('content/<int:id>/download',
+          views.ContentDownloadView.as_view(),
+          name='content_download'),
+
      path('content/<int:id>/delete',
           views.ContentDeleteView.as_view(),
           name='module_content_delete'),
@@ -50,4 +82,28 @@ urlpatterns = [
      path('module/<int:module_id>/',
           views.ModuleContentListView.as_view(),
           name='module_content_list'),
+
+     path('module/order/',
+          views.ModuleOrderView.as_view(),
+          name='module_order'),
+
+     path('content/order/',
+          views.ContentOrderView.as_view(),
+          name='content_order'),
+
+     path('module/<int:module_id>/upload/<model_name>/',
+          views.UploadCreateView.as_view(),
+          name='upload_create'),
+
+     path('upload/<int:id>/',
+          views.UploadChunkView.as_view(),
+          name='upload_chunk'),
+
+     path('upload/<int:id>/complete/',
+          views.UploadCompleteView.as_view(),
+          name='upload_complete'),
+
+     path('rendition/<str:token>/',
+          views.RenditionView.as_view(),
+          name='rendition'),
 ]
\ No newline at end of file
@@ -1,20 +1,46 @@
+import json
+import os
+from functools import partial
+
 from django.apps import apps
+from django.contrib import messages
 from django.contrib.auth.mixins import (LoginRequiredMixin,
                                         PermissionRequiredMixin)
-from django.forms.models import modelform_factory
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.http import (Http404, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import patch_cache_control
 from django.utils.text import slugify
-from django.views.generic import CreateView, TemplateView, UpdateView
+from django.views.generic import (CreateView, FormView, ListView,
+                                  TemplateView, UpdateView)
 from django.views.generic.base import TemplateResponseMixin, View
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import DeleteView
 from django_filters.views import FilterView
-from users.models import Profile
-
+from tutor.querybudget import query_budget
+from tutor.tasks import submit
+
+from .bundles import BundleError, export_course, import_course
+from .cache import bump_course_version
+from .cloning import clone_course
+from .deletion import delete_files, delete_items, tombstone_course
+from .downloads import get_backend as get_download_backend
 from .filters import CourseFilter
-from .forms import CreateUpdateCourseForm, ModuleFormSet
-from .models import Content, Course, Module
+from .forms import (CreateUpdateCourseForm, ImportCourseForm, ModuleFormSet,
+                    get_content_form)
+from .models import (Content, ContentProgress, Course, Enrollment, Module,
+                     Upload)
+from .pagination import CursorPaginationMixin
+from .progress import (COMPLETED, VIEWED, get_completion, get_statuses,
+                       record, recount_course)
+from .renditions import REDIRECT_MAX_AGE, read_token, render
+from .search import search_courses
+from .uploads import (UploadError, chunk_lock, get_backend, get_chunk_size,
+                      get_file_field)
 
 
 class OwnerMixin(object):
@@ -51,6 +77,7 @@ class OwnerCourseEditMixin(OwnerCourseMixin, OwnerEditMixin):
     success_url = reverse_lazy('learning:teacher_dashboard')
 
 
+@query_budget(4)
 class Dashboard(LoginRequiredMixin, TemplateView):
     """
     A class to represent main dashboard view.
@@ -58,15 +85,49 @@ class Dashboard(LoginRequiredMixin, TemplateView):
     template_name = 'learning/dashboard.html'
 
 
-class TeacherDashboard(OwnerCourseMixin, FilterView):
+@query_budget(6)
+class TeacherDashboard(CursorPaginationMixin, OwnerCourseMixin, FilterView):
     """
     A class to represent teacher dashboard view.
+    Courses are paginated with cursor on created date and id.
     """
     template_name = 'learning/teacher/teacher_dashboard.html'
     paginate_by = 10
     filterset_class = CourseFilter
+    count_mode = 'estimate'
         
 
+@query_budget(6)
+class CourseSearchView(ListView):
+    """
+    A class to represent full-text course search view.
+    """
+    template_name = 'learning/student/search.html'
+    paginate_by = 10
+
+    def get_queryset(self):
+        """
+        Returns published courses and courses of request user
+        matching the query, ordered by relevance.
+        """
+        self.query = self.request.GET.get('q', '').strip()
+        if not self.query:
+            return Course.objects.none()
+        return search_courses(
+            Course.objects.available_to(self.request.user)
+            .select_related('subject'),
+            self.query)
+
+    def get_context_data(self, **kwargs):
+        """
+        Adds query to the context.
+        """
+        context = super(CourseSearchView, self).get_context_data(**kwargs)
+        context['query'] = self.query
+        return context
+
+
+@query_budget(get=7)
 class CourseCreateView(PermissionRequiredMixin, 
                        OwnerCourseEditMixin,
                        CreateView):
@@ -86,17 +147,24 @@ class CourseCreateView(PermissionRequiredMixin,
         return super(CourseCreateView, self).form_valid(form)
     
 
+@query_budget(7)
 class CourseDeleteView(PermissionRequiredMixin,
                        OwnerCourseMixin, 
                        DeleteView):
     """
     A class to represent delete couse view.
+    Course is hidden at once and purged in background.
     """
     success_url = reverse_lazy('learning:teacher_dashboard')
     template_name = 'learning/teacher/delete_course.html'
     permission_required = 'learning.delete_course'
 
+    def form_valid(self, form):
+        tombstone_course(self.object)
+        return redirect(self.get_success_url())
 
+
+@query_budget(get=8)
 class CourseUpdateView(PermissionRequiredMixin,
                        OwnerCourseEditMixin,
                        UpdateView):
@@ -108,40 +176,194 @@ class CourseUpdateView(PermissionRequiredMixin,
     permission_required = 'learning.change_course'
 
 
-class CourseDetailView(OwnerCourseMixin, DetailView):
+@query_budget(get=7, post=25)
+class CourseCloneView(PermissionRequiredMixin,
+                      OwnerCourseMixin,
+                      DetailView):
+    """
+    A class to represent view duplicating course of request user,
+    e.g. for a new cohort.
+    """
+    template_name = 'learning/teacher/clone_course.html'
+    permission_required = 'learning.add_course'
+
+    def post(self, request, *args, **kwargs):
+        clone = clone_course(self.get_object(), request.user)
+        messages.success(request,
+                         'Course {} has been created'.format(clone.title))
+        return redirect('learning:update_course', clone.slug)
+
+
+@query_budget(get=6)
+class CourseImportView(PermissionRequiredMixin, LoginRequiredMixin, FormView):
+    """
+    A class to represent view importing course bundle
+    as a course of request user.
+    """
+    template_name = 'learning/teacher/import_course.html'
+    form_class = ImportCourseForm
+    permission_required = 'learning.add_course'
+
+    def form_valid(self, form):
+        """
+        Imports the bundle, errors of the bundle are shown in the form.
+        """
+        try:
+            course = import_course(form.cleaned_data['bundle'],
+                                   self.request.user)
+        except BundleError as error:
+            form.add_error('bundle', str(error))
+            return self.form_invalid(form)
+        messages.success(self.request,
+                         'Course {} has been imported'.format(course.title))
+        return redirect('learning:teacher_dashboard')
+
+
+@query_budget(15)
+class CourseExportView(OwnerCourseMixin, DetailView):
+    """
+    A class to represent view exporting course bundle.
+    Bundle is built while it is sent, so memory use does not depend
+    on the course size.
+    """
+    def render_to_response(self, context, **response_kwargs):
+        response = StreamingHttpResponse(export_course(self.object),
+                                         content_type='application/gzip')
+        response['Content-Disposition'] = \
+            'attachment; filename="{}.tar.gz"'.format(self.object.slug)
+        return response
+
+
+@query_budget(5)
+class CourseDetailView(LoginRequiredMixin, DetailView):
     """
     A class to represent detail course view for user that
     is interested in buying a course.
+    Shows published courses and courses of request user.
     """
+    model = Course
     template_name = 'learning/student/course_overview.html'
 
+    def get_queryset(self):
+        """
+        Joins course owner and the owner's profile.
+        """
+        return Course.objects.available_to(
+            self.request.user).select_related('owner__profile')
+
     def get_context_data(self, **kwargs):
         """
         Adds profile to context to make it accessible from templates.
         """
         context = super(CourseDetailView, self).get_context_data(**kwargs)
-        context['profile'] = Profile.objects.filter(
-            id=self.object.owner.profile.id)
+        context['profile'] = self.object.owner.profile
         return context
 
 
-class LearningView(DetailView, LoginRequiredMixin):
+@query_budget(8)
+class LearningView(LoginRequiredMixin, DetailView):
     """
     A class to represent learning view for user that bought course.
     """
     model = Course
     template_name = 'learning/student/learning_view.html'
 
+    def get_queryset(self):
+        """
+        Joins course owner. Modules are not prefetched,
+        the sidebar listing them is cached.
+        """
+        return super(LearningView, self).get_queryset().select_related(
+            'owner')
+
     def get_context_data(self, *args, **kwargs):
         """
         Adds self.object as course to the context so it can be retrieved
         in other templates such as CourseModelUpdateView.
+        Adds enrollment of request user, None if the user is not enrolled.
         """
         context = super(LearningView, self).get_context_data(*args, **kwargs)
         context['course'] = self.object
+        context['enrollment'] = Enrollment.objects.filter(
+            user=self.request.user, course=self.object).first()
         return context
 
 
+@query_budget(post=7)
+class EnrollView(LoginRequiredMixin, View):
+    """
+    A class to handle enrollment of request user in a course.
+    Users enroll in published courses, owners in their own courses too.
+    """
+    def post(self, request, slug):
+        course = get_object_or_404(Course, slug=slug)
+        if course.owner_id != request.user.id and \
+                course.status != 'Published':
+            raise Http404('Course does not exist')
+        Enrollment.objects.get_or_create(user=request.user, course=course)
+        return redirect('learning:learning_view', course.slug)
+
+
+@query_budget(14)
+class ModuleLearningView(LoginRequiredMixin, TemplateResponseMixin, View):
+    """
+    A class to handle module of a course for students enrolled in it,
+    and for its owner. Shows progress of the student on the contents,
+    and records contents the student has not seen as viewed.
+    """
+    template_name = 'learning/student/module.html'
+
+    def get(self, request, slug, module_id):
+        module = get_object_or_404(
+            Module.objects.select_related('course__owner').with_contents(),
+            id=module_id,
+            course__slug=slug,
+            course__deleted_at__isnull=True)
+        course = module.course
+        enrollment = Enrollment.objects.filter(
+            user=request.user, course=course).first()
+        if enrollment is None and course.owner_id != request.user.id:
+            return redirect('learning:learning_view', course.slug)
+        contents = list(module.contents.all())
+        if enrollment is not None:
+            statuses = get_statuses(enrollment, ContentProgress.objects.filter(
+                enrollment=enrollment,
+                content__in=[content.id for content in contents]
+            ).values_list('content_id', 'status'))
+            for content in contents:
+                content.status = statuses.get(content.id)
+                if content.status is None:
+                    record(enrollment, content.id, VIEWED)
+        return self.render_to_response({'object': course,
+                                        'course': course,
+                                        'module': module,
+                                        'contents': contents,
+                                        'enrollment': enrollment})
+
+
+@query_budget(post=5)
+class ContentCompleteView(LoginRequiredMixin, View):
+    """
+    A class to handle completion of a content by request user, enrolled
+    in its course. Completion is buffered and written in a batch,
+    returns completion percentage of the course.
+    """
+    def post(self, request, id):
+        enrollment = get_object_or_404(Enrollment,
+                                       user=request.user,
+                                       course__modules__contents=id,
+                                       course__deleted_at__isnull=True)
+        status = ContentProgress.objects.filter(
+            enrollment=enrollment,
+            content_id=id).values_list('status', flat=True).first()
+        status = get_statuses(enrollment, {id: status}).get(id)
+        if status != COMPLETED:
+            record(enrollment, id, COMPLETED)
+        return JsonResponse({'completed': True,
+                             'completion': get_completion(enrollment)})
+
+
+@query_budget(get=7)
 class CourseModuleUpdateView(TemplateResponseMixin, View):
     """
     A class to represent course module update view
@@ -159,7 +381,7 @@ class CourseModuleUpdateView(TemplateResponseMixin, View):
         """
         Handles course to use in get and update methods.
         """
-        self.course = get_object_or_404(Course,
+        self.course = get_object_or_404(Course.objects.select_related('owner'),
                                         id=pk,
                                         owner=request.user)
         return super(CourseModuleUpdateView, self).dispatch(request, pk)
@@ -179,12 +401,19 @@ class CourseModuleUpdateView(TemplateResponseMixin, View):
         course = self.course
         formset = self.get_formset(data=request.POST)
         if formset.is_valid():
-            formset.save()
+            with transaction.atomic():
+                modules = formset.save(commit=False)
+                for module in formset.deleted_objects:
+                    module.delete()
+                Module.objects.allocate_order(modules)
+                for module in modules:
+                    module.save()
             return redirect('learning:learning_view', slug=course.slug)
         return self.render_to_response({'course': course,
                                         'formset': formset})
     
 
+@query_budget(get=7)
 class ContentCreateUpdateView(TemplateResponseMixin, View):
     """
     A class to represent content creation and update view.
@@ -205,21 +434,18 @@ class ContentCreateUpdateView(TemplateResponseMixin, View):
     
     def get_form(self, model, *args, **kwargs):
         """
-        Dynamically builds form.
+        Builds form of the content model.
         """
-        Form = modelform_factory(model, exclude=['owner',
-                                                 'order',
-                                                 'created',
-                                                 'updated'])
-        return Form(*args, **kwargs)
+        return get_content_form(model)(*args, **kwargs)
     
     def dispatch(self, request, module_id, model_name, id=None):
         """
         Handles class parameters.
         """
-        self.module = get_object_or_404(Module,
-                                       id=module_id,
-                                       course__owner=request.user)
+        self.module = get_object_or_404(
+            Module.objects.select_related('course__owner'),
+            id=module_id,
+            course__owner=request.user)
         self.model = self.get_model(model_name)
         if id:
             self.obj = get_object_or_404(self.model,
@@ -233,9 +459,14 @@ class ContentCreateUpdateView(TemplateResponseMixin, View):
         Handels get method.
         """
         form = self.get_form(self.model, instance=self.obj)
+        upload_url = None
+        if not self.obj and model_name in ('file', 'image'):
+            upload_url = reverse('learning:upload_create',
+                                 args=[self.module.id, model_name])
         return self.render_to_response({'form': form,
                                         'object': self.obj,
-                                        'course': self.module.course})
+                                        'course': self.module.course,
+                                        'upload_url': upload_url})
 
     def post(self, request, module_id, model_name, id=None):
         """
@@ -246,18 +477,49 @@ class ContentCreateUpdateView(TemplateResponseMixin, View):
                              data=request.POST,
                              files=request.FILES)
         if form.is_valid():
-            obj = form.save(commit=False)
-            obj.owner = request.user
-            obj.save()
-            if not id:
-                # new content
-                Content.objects.create(module=self.module,
-                                       item=obj)
-            return redirect('module_content_list', self.module.id)
+            with transaction.atomic():
+                obj = form.save(commit=False)
+                obj.owner = request.user
+                obj.save()
+                if not id:
+                    # new content
+                    Content.objects.create(module=self.module,
+                                           item=obj)
+            return redirect('learning:module_content_list', self.module.id)
         return self.render_to_response({'form': form,
                                         'object': self.obj})
     
 
+@query_budget(4)
+class ContentDownloadView(LoginRequiredMixin, View):
+    """
+    A class to handle downloading file of image and file contents.
+    Files of published courses are available to every user,
+    of other courses only to their owners. Transfer itself is handed
+    over to the web server or to S3.
+    """
+    def get(self, request, id):
+        content = get_object_or_404(
+            Content.objects.select_related('content_type',
+                                           'module__course'),
+            id=id,
+            content_type__model__in=['image', 'file'],
+            module__course__deleted_at__isnull=True)
+        course = content.module.course
+        if course.owner_id != request.user.id and \
+                course.status != 'Published':
+            raise Http404('Content does not exist')
+        item = content.item
+        if item is None:
+            raise Http404('Content does not exist')
+        name = getattr(item, get_file_field(type(item)).attname).name
+        if not name:
+            raise Http404('Content has no file')
+        return get_download_backend().respond(request, name,
+                                              os.path.basename(name))
+
+
+@query_budget(8)
 class ContentDeleteView(View):
     """
     A class to handle deleting a content.
@@ -267,11 +529,15 @@ class ContentDeleteView(View):
                                     id=id,
                                     module__course__owner=request.user)
         module = content.module
-        content.item.delete()
+        delete_files(delete_items([content]))
         content.delete()
-        return redirect('module_content_list', module.id)
+        bump_course_version(module.course_id)
+        transaction.on_commit(partial(submit, recount_course,
+                                      module.course_id))
+        return redirect('learning:module_content_list', module.id)
     
 
+@query_budget(11)
 class ModuleContentListView(TemplateResponseMixin, View):
     """
     A class to handle the list of content.
@@ -279,8 +545,201 @@ class ModuleContentListView(TemplateResponseMixin, View):
     template_name = 'learning/teacher/contents.html'
 
     def get(self, request, module_id):
+        module = get_object_or_404(
+            Module.objects.select_related('course__owner').with_contents(),
+            id=module_id,
+            course__owner=request.user)
+        return self.render_to_response({'module': module,
+                                        'course': module.course})
+
+
+class OrderView(LoginRequiredMixin, View):
+    """
+    A class to handle reordering of objects owned by request user.
+    Expects JSON list of ids of all siblings, e.g. all modules
+    of a course, in the new order.
+    """
+    model = None
+    owner_field = None
+
+    def post(self, request):
+        try:
+            pks = [int(pk) for pk in json.loads(request.body)]
+            objs = self.model.objects.filter(
+                **{self.owner_field: request.user}).reorder(pks)
+        except (TypeError, ValueError):
+            return HttpResponseBadRequest()
+        self.reordered(objs)
+        return JsonResponse({'saved': 'OK'})
+
+    def reordered(self, objs):
+        """
+        Handles objects which order changed.
+        bulk_update sends no signals, so caches are invalidated here.
+        """
+        pass
+
+
+@query_budget(5)
+class ModuleOrderView(OrderView):
+    """
+    A class to handle reordering of course modules.
+    """
+    model = Module
+    owner_field = 'course__owner'
+
+    def reordered(self, objs):
+        """
+        Invalidates cached sidebars of courses with reordered modules.
+        """
+        course_ids = Module.objects.filter(
+            pk__in=[obj.pk for obj in objs]).order_by().values_list(
+            'course_id', flat=True).distinct()
+        for course_id in course_ids:
+            bump_course_version(course_id)
+
+
+@query_budget(4)
+class ContentOrderView(OrderView):
+    """
+    A class to handle reordering of module contents.
+    """
+    model = Content
+    owner_field = 'module__course__owner'
+
+
+class RenditionView(View):
+    """
+    A class to handle resized images.
+    Makes the rendition on first request and redirects to the stored file.
+    """
+    def get(self, request, token):
+        try:
+            name, width, height, fmt = read_token(token)
+        except signing.BadSignature:
+            raise Http404('Invalid rendition')
+        try:
+            rendition_name = render(name, width, height, fmt)
+        except OSError:
+            raise Http404('Image not found')
+        response = redirect(default_storage.url(rendition_name))
+        patch_cache_control(response, public=True,
+                            max_age=REDIRECT_MAX_AGE)
+        return response
+
+
+class UploadCreateView(LoginRequiredMixin, View):
+    """
+    A class to handle start of chunked upload of File or Image item.
+    Expects title, filename and size, returns upload id and chunk size.
+    """
+    def post(self, request, module_id, model_name):
         module = get_object_or_404(Module,
                                    id=module_id,
                                    course__owner=request.user)
-        return self.render_to_response({'module': module,
-                                        'course': module.course})
\ No newline at end of file
+        if model_name not in dict(Upload.MODEL_CHOICES):
+            raise Http404('Unknown content type')
+        try:
+            size = int(request.POST['size'])
+            title = request.POST['title'].strip()
+            filename = os.path.basename(request.POST['filename'])
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest()
+        if not title or not filename or size < 0:
+            return HttpResponseBadRequest()
+        field = get_file_field(apps.get_model('learning', model_name))
+        name = field.storage.get_available_name(
+            field.generate_filename(None, filename))
+        upload = Upload(owner=request.user,
+                        module=module,
+                        model_name=model_name,
+                        title=title,
+                        name=name,
+                        size=size)
+        get_backend().start(upload)
+        upload.save()
+        return JsonResponse(
+            {'id': upload.id,
+             'offset': 0,
+             'chunk_size': get_chunk_size(),
+             'url': reverse('learning:upload_chunk', args=[upload.id]),
+             'complete_url': reverse('learning:upload_complete',
+                                     args=[upload.id])},
+            status=201)
+
+
+class UploadChunkView(LoginRequiredMixin, View):
+    """
+    A class to handle chunks of an upload.
+    GET returns offset to resume from, PUT appends chunk sent at
+    offset given in X-Upload-Offset header.
+    """
+    def get(self, request, id):
+        upload = get_object_or_404(Upload,
+                                   id=id,
+                                   owner=request.user,
+                                   status='Pending')
+        return JsonResponse({'offset': get_backend().get_offset(upload),
+                             'size': upload.size})
+
+    def put(self, request, id):
+        try:
+            offset = int(request.headers['X-Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest()
+        upload = get_object_or_404(Upload,
+                                   id=id,
+                                   owner=request.user,
+                                   status='Pending')
+        if offset + length > upload.size:
+            return HttpResponseBadRequest()
+        backend = get_backend()
+        try:
+            with chunk_lock(upload):
+                upload.refresh_from_db(fields=['offset', 'parts'])
+                new_offset = backend.write(upload, offset, request, length)
+                with transaction.atomic():
+                    saved = Upload.objects.select_for_update().filter(
+                        pk=upload.pk, status='Pending').first()
+                    if saved is None or saved.offset != offset:
+                        raise UploadError('Upload changed meanwhile')
+                    upload.offset = new_offset
+                    upload.save(update_fields=['offset', 'parts',
+                                               'updated'])
+        except UploadError as error:
+            return JsonResponse({'error': str(error),
+                                 'offset': backend.get_offset(upload)},
+                                status=409)
+        return JsonResponse({'offset': upload.offset,
+                             'size': upload.size})
+
+
+class UploadCompleteView(LoginRequiredMixin, View):
+    """
+    A class to handle completion of an upload.
+    Creates the item and its content in the module.
+    """
+    def post(self, request, id):
+        with transaction.atomic():
+            upload = get_object_or_404(
+                Upload.objects.select_for_update().select_related('module'),
+                id=id,
+                owner=request.user,
+                status='Pending')
+            backend = get_backend()
+            if backend.get_offset(upload) != upload.size:
+                return JsonResponse({'error': 'Upload is not finished',
+                                     'offset': backend.get_offset(upload)},
+                                    status=409)
+            backend.complete(upload)
+            model = apps.get_model('learning', upload.model_name)
+            item = model.objects.create(
+                owner=request.user,
+                title=upload.title,
+                **{get_file_field(model).name: upload.name})
+            Content.objects.create(module=upload.module, item=item)
+            upload.status = 'Complete'
+            upload.save(update_fields=['status', 'updated'])
+        return JsonResponse({'redirect': reverse(
+            'learning:module_content_list', args=[upload.module.id])})
\ No newline at end of file
@@ -0,0 +1,87 @@
+// Sends files of content forms in chunks, so large files do not block
+// a server worker for the whole transfer and can be resumed.
+(function () {
+    'use strict';
+
+    var MAX_RETRIES = 5;
+
+    function getCookie(name) {
+        var match = document.cookie.match('(^|;)\\s*' + name + '=([^;]*)');
+        return match ? decodeURIComponent(match[2]) : null;
+    }
+
+    function request(method, url, body, headers) {
+        headers = headers || {};
+        headers['X-CSRFToken'] = getCookie('csrftoken');
+        return fetch(url, {
+            method: method,
+            body: body,
+            headers: headers,
+            credentials: 'same-origin'
+        }).then(function (response) {
+            return response.json().then(function (data) {
+                if (!response.ok && response.status !== 409) {
+                    throw new Error(data.error || response.statusText);
+                }
+                return data;
+            });
+        });
+    }
+
+    function sendChunks(upload, file, progress) {
+        // Resumes from the offset confirmed by the server.
+        function next(offset, retries) {
+            progress.value = offset;
+            if (offset >= file.size) {
+                return Promise.resolve();
+            }
+            var chunk = file.slice(offset, offset + upload.chunk_size);
+            return request('PUT', upload.url, chunk, {
+                'X-Upload-Offset': String(offset),
+                'Content-Type': 'application/octet-stream'
+            }).then(function (data) {
+                return next(data.offset, MAX_RETRIES);
+            }, function (error) {
+                if (!retries) {
+                    throw error;
+                }
+                return request('GET', upload.url).then(function (data) {
+                    return next(data.offset, retries - 1);
+                });
+            });
+        }
+        return next(upload.offset, MAX_RETRIES);
+    }
+
+    document.querySelectorAll('form[data-upload-url]').forEach(function (form) {
+        form.addEventListener('submit', function (event) {
+            var input = form.querySelector('input[type=file]');
+            if (!input || !input.files.length) {
+                return;
+            }
+            event.preventDefault();
+            var file = input.files[0];
+            var progress = document.createElement('progress');
+            progress.max = file.size;
+            form.appendChild(progress);
+
+            var data = new FormData();
+            data.append('title', form.querySelector('[name=title]').value);
+            data.append('filename', file.name);
+            data.append('size', file.size);
+            request('POST', form.dataset.uploadUrl, data)
+                .then(function (upload) {
+                    return sendChunks(upload, file, progress).then(function () {
+                        return request('POST', upload.complete_url);
+                    });
+                })
+                .then(function (data) {
+                    window.location = data.redirect;
+                })
+                .catch(function (error) {
+                    progress.remove();
+                    alert('Upload failed: ' + error.message);
+                });
+        });
+    });
+})();
@@ -8,8 +8,14 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 """
 
 import os
+from pathlib import Path
 
-from django.core.asgi import get_asgi_application
+from dotenv import load_dotenv
+
+from tutor.handlers import get_asgi_application
+
+env_path = Path(__file__).resolve().parent / 'settings/.env-dev'
+load_dotenv(dotenv_path=env_path)
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tutor.settings')
 
@@ -0,0 +1,24 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+
+
+def get_version(key):
+    """
+    Returns current version stored under the key in the shared cache.
+    A new version is created if the key is missing, e.g. after
+    the cache was cleared, so stale copies are never reused.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    Replaces the version stored under the key,
+    which invalidates everything cached for the previous one.
+    """
+    cache.set(key, uuid4().hex, None)
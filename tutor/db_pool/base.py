@@ -0,0 +1,56 @@
+from functools import partial
+
+from django.db.backends.postgresql import base, creation
+
+from .pool import close_pools, get_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """
+    A class to represent creation of test databases, which closes
+    pooled connections before the test database is dropped.
+    """
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools()
+        super(DatabaseCreation, self)._destroy_test_db(test_database_name,
+                                                       verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    A class to represent PostgreSQL connection taken from the pool of the
+    worker process. Closing the connection, e.g. at the end of a request,
+    returns it to the pool, so requests of any thread reuse connections
+    without the TCP and authentication handshake.
+    Pool is configured with OPTIONS['pool'], keyword arguments
+    of ConnectionPool.
+    CONN_MAX_AGE should stay 0, persistent connections of threads would
+    keep connections out of the pool.
+    """
+    creation_class = DatabaseCreation
+
+    def get_connection_params(self):
+        conn_params = super(DatabaseWrapper, self).get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict['OPTIONS']
+        key = (self.alias, options.get('isolation_level'),
+               repr(sorted(conn_params.items())))
+        connect = partial(super(DatabaseWrapper, self).get_new_connection,
+                          conn_params)
+        return get_pool(key, connect, **options.get('pool', {}))
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        connection = self.pool.acquire()
+        # Set by base class for new connections only
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,246 @@
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+import psycopg2
+from psycopg2 import extensions
+
+MAX_SIZE = 10
+
+MAX_LIFETIME = 30 * 60
+
+MAX_IDLE = 5 * 60
+
+CHECK_INTERVAL = 5
+
+TIMEOUT = 10
+
+# Sums waits for connections of the current request, see WaitTimer
+wait_timer = ContextVar('wait_timer', default=None)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """
+    Raised when no connection is returned to a full pool in time.
+    """
+
+
+class WaitTimer(object):
+    """
+    A class to represent time a request spent waiting for connections.
+    Set as wait_timer of the request context, it is shared with threads
+    of the request, which get a copy of the context.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+class ConnectionPool(object):
+    """
+    A class to represent pool of connections of one worker process.
+    At most max_size connections are open, others wait up to timeout
+    seconds for one to be returned. Connections idle for more than
+    check_interval seconds are checked with a query before reuse,
+    connections older than max_lifetime or idle for more than max_idle
+    seconds are closed, so the database server can rebalance them.
+    """
+    def __init__(self, connect, max_size=MAX_SIZE, max_lifetime=MAX_LIFETIME,
+                 max_idle=MAX_IDLE, check_interval=CHECK_INTERVAL,
+                 timeout=TIMEOUT):
+        self.connect = connect
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        # idle connections with their creation and last use times,
+        # most recently used on the right
+        self.idle = deque()
+        self.created = {}
+        self.size = 0
+        self.stats = {'opened': 0, 'closed': 0, 'acquired': 0, 'waited': 0,
+                      'wait_time': 0.0, 'max_wait': 0.0, 'timeouts': 0,
+                      'failed_checks': 0}
+
+    def acquire(self):
+        """
+        Returns a healthy connection, reused or new one.
+        """
+        start = time.monotonic()
+        waited = False
+        while True:
+            with self.condition:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(
+                            'No database connection available in {} '
+                            'seconds, pool size is {}'.format(
+                                self.timeout, self.max_size))
+                    waited = True
+                    self.condition.wait(remaining)
+                if self.idle:
+                    connection, used = self.idle.pop()
+                else:
+                    connection = None
+                    self.size += 1
+            if connection is None:
+                connection = self.open()
+            elif not self.is_healthy(connection, used):
+                self.discard(connection)
+                continue
+            self.record_wait(time.monotonic() - start if waited else 0.0)
+            return connection
+
+    def open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created[connection] = time.monotonic()
+            self.stats['opened'] += 1
+        return connection
+
+    def is_healthy(self, connection, used):
+        """
+        Checks connection taken from idle ones. Server closes connections
+        on restarts and failovers, which only a query can notice.
+        """
+        now = time.monotonic()
+        if connection.closed or \
+                now - self.created[connection] > self.max_lifetime:
+            return False
+        if now - used <= self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            with self.condition:
+                self.stats['failed_checks'] += 1
+            return False
+        return True
+
+    def record_wait(self, wait):
+        with self.condition:
+            self.stats['acquired'] += 1
+            if wait:
+                self.stats['waited'] += 1
+                self.stats['wait_time'] += wait
+                self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+        timer = wait_timer.get()
+        if timer is not None:
+            timer.count += 1
+            timer.duration += wait
+
+    def release(self, connection):
+        """
+        Returns connection to the pool, rolled back to idle state.
+        Broken and expired connections are closed instead.
+        """
+        if connection not in self.created:
+            connection.close()
+            return
+        status = extensions.TRANSACTION_STATUS_UNKNOWN \
+            if connection.closed else connection.info.transaction_status
+        if status in (extensions.TRANSACTION_STATUS_INTRANS,
+                      extensions.TRANSACTION_STATUS_INERROR):
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                status = extensions.TRANSACTION_STATUS_UNKNOWN
+            else:
+                status = extensions.TRANSACTION_STATUS_IDLE
+        now = time.monotonic()
+        if status != extensions.TRANSACTION_STATUS_IDLE or \
+                now - self.created[connection] > self.max_lifetime:
+            self.discard(connection)
+            return
+        with self.condition:
+            self.idle.append((connection, now))
+            self.close_idle(now)
+            self.condition.notify()
+
+    def close_idle(self, now):
+        """
+        Closes connections unused for more than max_idle seconds,
+        the least recently used ones are on the left.
+        """
+        while self.idle and now - self.idle[0][1] > self.max_idle:
+            connection, used = self.idle.popleft()
+            self.forget(connection)
+            connection.close()
+
+    def discard(self, connection):
+        with self.condition:
+            self.forget(connection)
+            self.condition.notify()
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def forget(self, connection):
+        self.created.pop(connection, None)
+        self.size -= 1
+        self.stats['closed'] += 1
+
+    def close(self):
+        """
+        Closes idle connections, e.g. before the database is dropped.
+        """
+        with self.condition:
+            while self.idle:
+                connection, used = self.idle.pop()
+                self.forget(connection)
+                connection.close()
+
+    def get_stats(self):
+        with self.condition:
+            return dict(self.stats, size=self.size, idle=len(self.idle),
+                        max_size=self.max_size)
+
+
+_lock = threading.Lock()
+
+_pools = {}
+
+# Pools inherited through fork are kept referenced, so their connections
+# are never closed from the child, which would close them for the parent
+_inherited = []
+
+
+def get_pool(key, connect, **options):
+    """
+    Returns pool of the process for the connection parameters key,
+    created on first use. Pools inherited from a parent process are
+    replaced, their connections belong to the parent.
+    """
+    with _lock:
+        pool = _pools.get(key)
+        if pool is not None and pool.pid != os.getpid():
+            _inherited.append(pool)
+            pool = None
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, **options)
+        return pool
+
+
+def get_pools():
+    with _lock:
+        return [pool for pool in _pools.values() if pool.pid == os.getpid()]
+
+
+def close_pools():
+    for pool in get_pools():
+        pool.close()
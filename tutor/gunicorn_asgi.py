@@ -0,0 +1,12 @@
+"""
+Gunicorn configuration of ASGI deployment.
+
+Every worker process runs uvicorn event loop, which serves
+many connections at once. Views are sync and run in a thread
+of the worker, so this deployment is slower than the default one.
+
+Usage: gunicorn tutor.asgi -c tutor/gunicorn_asgi.py
+"""
+from tutor.gunicorn_base import *
+
+worker_class = 'uvicorn.workers.UvicornWorker'
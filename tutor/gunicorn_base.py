@@ -0,0 +1,67 @@
+"""
+Gunicorn settings and hooks shared by WSGI and ASGI deployments.
+
+Configurations of both deployments import everything from this module
+and add their worker class.
+"""
+import multiprocessing
+import os
+
+bind = '0.0.0.0:{}'.format(os.environ.get('PORT', '8000'))
+
+workers = int(os.environ.get('WEB_CONCURRENCY',
+                             multiprocessing.cpu_count()))
+
+timeout = 30
+
+graceful_timeout = 30
+
+keepalive = 5
+
+# Restarts workers now and then, so leaked memory is returned
+max_requests = 5000
+
+max_requests_jitter = 500
+
+accesslog = '-'
+
+# Set while master folds metrics of exited workers
+folding = False
+
+
+def post_worker_init(worker):
+    """
+    Warms up the worker after the app is loaded,
+    before it accepts connections.
+    """
+    from tutor.warmup import warm_up
+    warm_up()
+
+
+def worker_exit(server, worker):
+    """
+    Writes progress events and metrics of the worker before it exits.
+    """
+    from learning.progress import buffer
+    from tutor.metrics import registry
+    buffer.flush()
+    registry.flush(force=True)
+
+
+def child_exit(server, worker):
+    """
+    Folds metrics of exited workers into totals of finished workers.
+    Runs in signal handler of the master, which has no Django settings.
+    A call interrupting another one returns, files it would fold are
+    counted as live until the next call.
+    """
+    global folding
+    if folding:
+        return
+    folding = True
+    try:
+        from tutor.metrics import DEFAULT_DIRECTORY, fold_workers
+        fold_workers(set(server.WORKERS),
+                     os.environ.get('METRICS_DIR', DEFAULT_DIRECTORY))
+    finally:
+        folding = False
@@ -0,0 +1,15 @@
+"""
+Gunicorn configuration of WSGI deployment, the default one.
+
+Every worker process serves GUNICORN_THREADS requests at once,
+one per thread.
+
+Usage: gunicorn tutor.wsgi -c tutor/gunicorn_wsgi.py
+"""
+import os
+
+from tutor.gunicorn_base import *
+
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+
+worker_class = 'gthread' if threads > 1 else 'sync'
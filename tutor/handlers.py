@@ -0,0 +1,50 @@
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    A class to represent ASGI handler, which iterates streaming responses
+    in the thread of the request instead of the event loop. Generators of
+    streaming views, like course export, query the database and read
+    files, neither of which may run in the event loop.
+    """
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super(ASGIHandler, self).send_response(response,
+                                                                send)
+        response_headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            response_headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            response_headers.append(
+                (b'Set-Cookie', cookie.output(header='').encode('ascii')
+                 .strip()))
+        await send({'type': 'http.response.start',
+                    'status': response.status_code,
+                    'headers': response_headers})
+        iterator = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await next_part(iterator, None)
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True})
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_asgi_application():
+    """
+    Returns ASGI application of the project, as Django's function does.
+    """
+    django.setup(set_prefix=False)
+    return ASGIHandler()
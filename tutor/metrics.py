@@ -0,0 +1,333 @@
+import glob
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from uuid import uuid4
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+
+from tutor.db_pool.pool import WaitTimer, wait_timer
+from tutor.querybudget import aexecute_wrappers, execute_wrappers
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                    1.0, 2.5, 5.0, 10.0)
+
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+METRICS = {
+    'tutor_request_duration_seconds': (
+        'Time spent handling requests', DURATION_BUCKETS),
+    'tutor_db_queries': (
+        'Number of SQL queries per request', COUNT_BUCKETS),
+    'tutor_db_duration_seconds': (
+        'Time spent in SQL queries per request', DURATION_BUCKETS),
+    'tutor_template_render_seconds': (
+        'Time spent rendering templates per request, '
+        'queries made by templates included', DURATION_BUCKETS),
+    'tutor_db_pool_wait_seconds': (
+        'Time spent waiting for pooled database connections per request',
+        DURATION_BUCKETS),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Other methods share one label, so clients cannot add label values
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+DEFAULT_DIRECTORY = '/tmp/tutor_metrics'
+
+# File with totals of finished workers
+FINISHED = 'finished.json'
+
+
+class Registry(object):
+    """
+    A class to represent histograms of a single process.
+    Every histogram is a list of bucket counts followed by sum and count,
+    keyed by metric name, view name and HTTP method.
+    Histograms are cumulative, so histograms of finished workers
+    can be summed with the live ones.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.flushed = 0
+        self.pid = None
+        self.name = None
+
+    def observe(self, metric, view, method, value):
+        buckets = METRICS[metric][1]
+        key = (metric, view, method)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 2)
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(key), list(histogram)]
+                    for key, histogram in self.histograms.items()]
+
+    def get_name(self):
+        """
+        Returns name of the file of the process. Names are unique,
+        so a process reusing PID of a finished worker does not
+        overwrite its histograms.
+        """
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.name = '{}-{}.json'.format(self.pid, uuid4().hex[:8])
+        return self.name
+
+    def flush(self, force=False):
+        """
+        Writes histograms to the file of the process, at most once in
+        METRICS_FLUSH_INTERVAL seconds unless forced.
+        """
+        now = time.monotonic()
+        if not force and now - self.flushed < getattr(
+                settings, 'METRICS_FLUSH_INTERVAL', 5):
+            return
+        self.flushed = now
+        write_file(get_directory(), self.get_name(), self.snapshot())
+
+
+registry = Registry()
+
+
+def get_directory():
+    return getattr(settings, 'METRICS_DIR', DEFAULT_DIRECTORY)
+
+
+def write_file(directory, name, data):
+    """
+    Writes data to the file as JSON. File is replaced atomically,
+    so readers never see partial data.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(data, file)
+    os.replace(path, os.path.join(directory, name))
+
+
+def read_file(path, default):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return default
+
+
+def add_histograms(totals, entries):
+    for key, histogram in entries:
+        key = tuple(key)
+        if key[0] not in METRICS:
+            continue
+        total = totals.setdefault(key, [0] * len(histogram))
+        for index, value in enumerate(histogram):
+            total[index] += value
+
+
+def collect():
+    """
+    Returns histograms summed across files of live worker processes
+    and totals of finished ones. Files of workers are read first,
+    so a file folded meanwhile is skipped, as totals list it.
+    """
+    registry.flush(force=True)
+    directory = get_directory()
+    files = {}
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        name = os.path.basename(path)
+        if name != FINISHED:
+            files[name] = read_file(path, [])
+    finished = read_file(os.path.join(directory, FINISHED), {})
+    folded = set(finished.get('folded', []))
+    totals = {}
+    add_histograms(totals, finished.get('histograms', []))
+    for name, entries in files.items():
+        if name not in folded:
+            add_histograms(totals, entries)
+    return totals
+
+
+def fold_workers(live_pids, directory=None):
+    """
+    Adds histograms of finished worker processes to totals of finished
+    workers and removes their files, so files of recycled workers do not
+    pile up. Called by gunicorn master, with PIDs of its live workers.
+    Removed files stay listed as folded, until the next call.
+    """
+    directory = directory or get_directory()
+    paths = [path for path in
+             glob.glob(os.path.join(directory, '*-*.json'))
+             if int(os.path.basename(path).split('-')[0]) not in live_pids]
+    if not paths:
+        return
+    finished = read_file(os.path.join(directory, FINISHED), {})
+    totals = {}
+    add_histograms(totals, finished.get('histograms', []))
+    for path in paths:
+        add_histograms(totals, read_file(path, []))
+    existing = {os.path.basename(path) for path in
+                glob.glob(os.path.join(directory, '*.json'))}
+    folded = [name for name in finished.get('folded', [])
+              if name in existing]
+    folded.extend(os.path.basename(path) for path in paths)
+    write_file(directory, FINISHED, {
+        'folded': folded,
+        'histograms': [[list(key), histogram]
+                       for key, histogram in totals.items()]})
+    for path in paths:
+        os.remove(path)
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def render_metrics(totals):
+    """
+    Returns histograms in Prometheus text exposition format.
+    """
+    lines = []
+    for metric, (description, buckets) in METRICS.items():
+        lines.append('# HELP {} {}'.format(metric, description))
+        lines.append('# TYPE {} histogram'.format(metric))
+        for (name, view, method), histogram in sorted(totals.items()):
+            if name != metric:
+                continue
+            labels = 'view="{}",method="{}"'.format(escape(view),
+                                                   escape(method))
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), histogram):
+                cumulative += count
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                    metric, labels, bound, cumulative))
+            lines.append('{}_sum{{{}}} {}'.format(metric, labels,
+                                                  histogram[-2]))
+            lines.append('{}_count{{{}}} {}'.format(metric, labels,
+                                                    histogram[-1]))
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTimer(object):
+    """
+    A class to represent execute wrapper, which counts executed queries
+    and sums their time.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware(object):
+    """
+    A middleware that records latency, SQL queries, waits for pooled
+    connections and template rendering time of requests, labeled with
+    URL name of the view.
+    Histograms are kept in memory and periodically written to
+    METRICS_DIR, which is shared by worker processes of the host.
+    Works in sync and async mode.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        request.template_render_time = None
+        token = wait_timer.set(WaitTimer())
+        try:
+            with execute_wrappers(QueryTimer()) as timer:
+                response = self.get_response(request)
+            self.record(request, timer, time.perf_counter() - start)
+        finally:
+            wait_timer.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        request.template_render_time = None
+        token = wait_timer.set(WaitTimer())
+        try:
+            async with aexecute_wrappers(QueryTimer()) as timer:
+                response = await self.get_response(request)
+            self.record(request, timer, time.perf_counter() - start)
+        finally:
+            wait_timer.reset(token)
+        return response
+
+    def record(self, request, timer, duration):
+        """
+        Observes metrics of the request and flushes them, when it is time.
+        """
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        method = request.method if request.method in METHODS else 'OTHER'
+        registry.observe('tutor_request_duration_seconds', view, method,
+                         duration)
+        registry.observe('tutor_db_queries', view, method, timer.count)
+        registry.observe('tutor_db_duration_seconds', view, method,
+                         timer.duration)
+        if request.template_render_time is not None:
+            registry.observe('tutor_template_render_seconds', view, method,
+                             request.template_render_time)
+        waits = wait_timer.get()
+        if waits.count:
+            registry.observe('tutor_db_pool_wait_seconds', view, method,
+                             waits.duration)
+        registry.flush()
+
+    def process_template_response(self, request, response):
+        """
+        Measures rendering of template response, which follows
+        right after this hook.
+        """
+        start = time.perf_counter()
+
+        def rendered(response):
+            request.template_render_time = time.perf_counter() - start
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """
+    Returns metrics of all workers in Prometheus text format.
+    Requires METRICS_TOKEN as bearer token or a staff user.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorization = request.headers.get('Authorization', '')
+    if not (token and hmac.compare_digest(
+            authorization.encode(), 'Bearer {}'.format(token).encode())) \
+            and not request.user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(render_metrics(collect()),
+                        content_type=CONTENT_TYPE)
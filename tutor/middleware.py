@@ -0,0 +1,104 @@
+import time
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from tutor.routers import RoutingState, get_replicas, routing_state
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    A WhiteNoise middleware, which runs in async mode too,
+    so requests under ASGI stay in the event loop on their way
+    to async views. Static files are served from a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super(StaticFilesMiddleware, self).__init__(get_response,
+                                                    *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super(StaticFilesMiddleware, self).__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(
+                request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class ReplicaMiddleware(object):
+    """
+    A middleware that sets database routing of the request for
+    ReplicaRouter. Requests with unsafe methods read from the primary.
+    A response to a request that wrote sets REPLICA_STICKY_COOKIE,
+    then requests of the client read from the primary for
+    REPLICA_STICKY_SECONDS, so the page after a redirect never shows
+    data that replicas have not received yet.
+    Works in sync and async mode.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.get_state(request)
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        return self.stick(state, response)
+
+    async def __acall__(self, request):
+        state = self.get_state(request)
+        token = routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        return self.stick(state, response)
+
+    def get_state(self, request):
+        try:
+            sticky_until = float(request.COOKIES.get(
+                getattr(settings, 'REPLICA_STICKY_COOKIE', 'primary'), 0))
+        except ValueError:
+            sticky_until = 0
+        return RoutingState(primary=request.method not in SAFE_METHODS or
+                            sticky_until > time.time())
+
+    def stick(self, state, response):
+        """
+        Sets the cookie, which keeps the client on the primary.
+        """
+        if state.wrote and get_replicas():
+            seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(
+                getattr(settings, 'REPLICA_STICKY_COOKIE', 'primary'),
+                str(int(time.time()) + seconds),
+                max_age=seconds,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax')
+        return response
@@ -0,0 +1,149 @@
+import logging
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when a view makes more queries than its budget allows.
+    """
+
+
+class QueryCounter(object):
+    """
+    A class to represent execute wrapper, which counts executed queries.
+
+    Attributes:
+    -----------
+    queries : SQL of executed queries
+    """
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+
+@contextmanager
+def execute_wrappers(wrapper):
+    """
+    Installs execute wrapper on all database connections of the thread.
+    """
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield wrapper
+
+
+@asynccontextmanager
+async def aexecute_wrappers(wrapper):
+    """
+    Installs execute wrapper on database connections of the thread
+    that runs sync code of the current async request. Async ORM
+    queries of the request run in that thread too, as they are
+    thread sensitive.
+    """
+    stack = ExitStack()
+    await sync_to_async(stack.enter_context)(execute_wrappers(wrapper))
+    try:
+        yield wrapper
+    finally:
+        await sync_to_async(stack.close)()
+
+
+@contextmanager
+def count_queries():
+    """
+    Counts queries executed on all database connections within the block.
+    """
+    with execute_wrappers(QueryCounter()) as counter:
+        yield counter
+
+
+def query_budget(budget=None, **methods):
+    """
+    Declares number of queries a view is allowed to make.
+    Decorates view classes and view functions. Budget applies to every
+    HTTP method, unless the method has its own budget, e.g.
+    query_budget(5, post=8) or query_budget(get=5).
+    """
+    budgets = {method.lower(): value for method, value in methods.items()}
+    if budget is not None:
+        budgets[None] = budget
+
+    def decorator(view):
+        view.query_budget = budgets
+        return view
+    return decorator
+
+
+def get_query_budget(view, method):
+    """
+    Returns budget that the view declared for the HTTP method,
+    None if it declared none.
+    """
+    budgets = getattr(view, 'query_budget', None)
+    if budgets is None:
+        budgets = getattr(getattr(view, 'view_class', None),
+                          'query_budget', None)
+    if not budgets:
+        return None
+    return budgets.get(method.lower(), budgets.get(None))
+
+
+class QueryBudgetMiddleware(object):
+    """
+    A middleware that counts queries of every request, template rendering
+    included, and reports views that went over their budget.
+    Reports are logged, or raised if QUERY_BUDGET_RAISE setting is True.
+    Query count is sent in X-Query-Count header when DEBUG
+    or QUERY_COUNT_HEADER setting is True.
+    Works in sync and async mode.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with count_queries() as counter:
+            response = self.get_response(request)
+        return self.check(request, response, counter)
+
+    async def __acall__(self, request):
+        async with aexecute_wrappers(QueryCounter()) as counter:
+            response = await self.get_response(request)
+        return self.check(request, response, counter)
+
+    def check(self, request, response, counter):
+        """
+        Reports the view, if it went over its budget.
+        """
+        match = request.resolver_match
+        budget = get_query_budget(match.func, request.method) \
+            if match else None
+        if budget is not None and counter.count > budget:
+            message = '{} {} made {} queries, budget is {}'.format(
+                request.method, match.view_name, counter.count, budget)
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        if settings.DEBUG or getattr(settings, 'QUERY_COUNT_HEADER', False):
+            response['X-Query-Count'] = counter.count
+        return response
@@ -0,0 +1,80 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Routing state of the current request, see RoutingState
+routing_state = ContextVar('routing_state', default=None)
+
+
+class RoutingState(object):
+    """
+    A class to represent database routing of a single request.
+    Reads go to one replica for the whole request, unless the request
+    uses the primary: it is not safe, its user wrote recently, or it
+    wrote itself. Threads of the request share the state, as they get
+    a copy of the request context.
+    """
+    def __init__(self, primary=False):
+        self.primary = primary
+        self.wrote = False
+        self.replica = None
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    """
+    Sends reads of the request to the primary inside the block, e.g. reads
+    which fill the shared cache. A replica behind the primary would store
+    stale data under a new version, which is kept until the next bump.
+    """
+    state = routing_state.get()
+    if state is None or state.primary:
+        yield
+        return
+    state.primary = True
+    try:
+        yield
+    finally:
+        state.primary = False
+
+
+class ReplicaRouter(object):
+    """
+    A router that sends reads of requests to replicas listed in
+    DATABASE_REPLICAS and writes to the primary, the default database.
+    Reads outside of requests, e.g. in commands and background tasks,
+    and reads in transactions go to the primary.
+    """
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        replicas = get_replicas()
+        if state is None or state.primary or state.wrote or not replicas \
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = [DEFAULT_DB_ALIAS] + get_replicas()
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
@@ -0,0 +1,44 @@
+from django.contrib.sessions.backends import cached_db
+
+# Marks sessions shared by many visitors, e.g. the session of demo user
+SHARED_SESSION_KEY = '_shared'
+
+
+class SessionStore(cached_db.SessionStore):
+    """
+    A class to represent session read from the cache and written through
+    to the database, like cached_db sessions, which is not written when
+    its data did not change. Requests mark sessions modified without
+    changing them, e.g. by logging in the user who is logged in already.
+    Shared sessions are never deleted by one of their visitors, logout
+    and login move the visitor to a session of their own instead.
+    """
+    def load(self):
+        data = super(SessionStore, self).load()
+        self.saved_state = self.get_state(data)
+        return data
+
+    def get_state(self, data):
+        return self.session_key, self.serializer().dumps(data)
+
+    def flush(self):
+        if not self.get(SHARED_SESSION_KEY):
+            return super(SessionStore, self).flush()
+        self.clear()
+        self._session_key = None
+
+    def cycle_key(self):
+        if not self.get(SHARED_SESSION_KEY):
+            return super(SessionStore, self).cycle_key()
+        data = dict(self._session)
+        del data[SHARED_SESSION_KEY]
+        self._session_cache = data
+        self.create()
+
+    def save(self, must_create=False):
+        state = self.get_state(self._get_session(no_load=must_create))
+        if not must_create and self.session_key is not None and \
+                state == getattr(self, 'saved_state', None):
+            return
+        super(SessionStore, self).save(must_create)
+        self.saved_state = self.get_state(self._session)
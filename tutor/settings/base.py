@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -36,7 +37,6 @@ INSTALLED_APPS = [
     "storages",
     "crispy_forms",
     "crispy_bootstrap5",
-    "debug_toolbar",
     'django_filters',
 
     # My apps:
@@ -47,19 +47,36 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "users.User"
 
 MIDDLEWARE = [
+    'tutor.metrics.MetricsMiddleware',
+    'tutor.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'tutor.middleware.StaticFilesMiddleware',
+    'tutor.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
 ROOT_URLCONF = 'tutor.urls'
 
+# Views over their query budget are logged, or raise if set to True
+
+QUERY_BUDGET_RAISE = False
+
+# Sends query count of requests in X-Query-Count header, used by benchmark
+
+QUERY_COUNT_HEADER = bool(os.environ.get('QUERY_COUNT_HEADER'))
+
+# Request metrics, shared by workers through files in METRICS_DIR
+# and served to Prometheus with METRICS_TOKEN as bearer token
+
+METRICS_DIR = os.environ.get('METRICS_DIR', '/tmp/tutor_metrics')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -80,6 +97,68 @@ TEMPLATES = [
 WSGI_APPLICATION = 'tutor.wsgi.application'
 
 
+# Database replicas
+# Reads of requests go to aliases of DATABASE_REPLICAS, writes to default.
+# Clients stay on the primary for REPLICA_STICKY_SECONDS after writing,
+# so they read their own writes.
+
+DATABASE_ROUTERS = ['tutor.routers.ReplicaRouter']
+
+DATABASE_REPLICAS = []
+
+REPLICA_STICKY_COOKIE = 'primary'
+
+REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# File based cache is shared by all workers on the host.
+# It holds subjects, course versions, sidebars, content counts, sessions,
+# permissions and rendition markers. A full cache culls entries at random,
+# version keys included, so MAX_ENTRIES is sized for all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', '/tmp/tutor_cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '100000')),
+        },
+    }
+}
+
+
+# Sessions
+# Sessions are read from the cache and written through to the database
+# only when their data changes. signed_cookies engine keeps them out of
+# the database altogether, at the cost of larger cookies.
+
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'tutor.sessions')
+
+
+# Background tasks
+# Tasks run in a thread pool of every worker process.
+
+BACKGROUND_TASKS = True
+
+BACKGROUND_WORKERS = 2
+
+
+# Learning progress
+# Progress events are buffered by every worker process and written
+# in batches of PROGRESS_BATCH_SIZE, or PROGRESS_FLUSH_INTERVAL seconds
+# after the first buffered event.
+
+PROGRESS_BATCH_SIZE = 500
+
+PROGRESS_FLUSH_INTERVAL = 5
+
+
+# Authentication
+# Permissions of users are kept in the shared cache.
+
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
 
 
 # Password validation
@@ -130,10 +209,32 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
 
+# collectstatic fingerprints files and precompresses them with gzip,
+# and brotli if installed. WhiteNoise serves fingerprinted files
+# with far-future, immutable Cache-Control.
+
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = 'media'
 
+# Size of chunks of resumable uploads, at least 5 MB required by S3
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Downloads of file contents
+# SENDFILE_HEADER hands transfers of local files to the web server:
+# X-Accel-Redirect for nginx, with SENDFILE_URL as internal location
+# aliasing MEDIA_ROOT, or X-Sendfile for Apache and lighttpd.
+# Downloads from S3 redirect to URLs valid for DOWNLOAD_URL_EXPIRE seconds.
+
+SENDFILE_HEADER = os.environ.get('SENDFILE_HEADER')
+
+SENDFILE_URL = '/protected-media/'
+
+DOWNLOAD_URL_EXPIRE = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -4,6 +4,8 @@ from .base import *
 
 DEBUG = True
 
+QUERY_BUDGET_RAISE = True
+
 ALLOWED_HOSTS = ["127.0.0.1"]
 
 SECRET_KEY = 'django-insecure-6%)%txlwh)+rqmv8s)frvz!tx3wh)%!2h=9rl&thp66)i0gk=i'
@@ -12,7 +14,7 @@ SECRET_KEY = 'django-insecure-6%)%txlwh)+rqmv8s)frvz!tx3wh)%!2h=9rl&thp66)i0gk=i
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'tutor.db_pool',
         'NAME': 'postgres',
         'USER': 'postgres',
         'PASSWORD': 'postgres',
@@ -26,4 +28,11 @@ DATABASES = {
 if DEBUG:
     import socket
     hostname, _, ips = socket.gethostbyname_ex(socket.gethostname())
-    INTERNAL_IPS = [ip[: ip.rfind(".")] + ".1" for ip in ips] + ["127.0.0.1", "10.0.2.2"]
\ No newline at end of file
+    INTERNAL_IPS = [ip[: ip.rfind(".")] + ".1" for ip in ips] + ["127.0.0.1", "10.0.2.2"]
+
+# Debug toolbar middleware is sync only, under ASGI it moves
+# every request to a thread, so it is used in development only.
+
+INSTALLED_APPS += ["debug_toolbar"]
+
+MIDDLEWARE += ["debug_toolbar.middleware.DebugToolbarMiddleware"]
\ No newline at end of file
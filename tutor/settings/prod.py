@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 from pathlib import Path
 
@@ -24,17 +25,58 @@ CSRF_TRUSTED_ORIGINS = ["https://tutor-production-d86c.up.railway.app"]
 
 # Database
 
+# Every worker process keeps its own pool of connections, pools of all
+# workers together stay within DB_MAX_CONNECTIONS of the database server.
+# Workers are counted as in tutor/gunicorn_asgi.py, threads of sync
+# workers use at most one connection each.
+
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY",
+                                     multiprocessing.cpu_count()))
+
+DB_POOL_SIZE = max(int(os.environ.get("DB_MAX_CONNECTIONS", "80")) //
+                   WEB_CONCURRENCY, 1)
+
+if os.environ.get("GUNICORN_THREADS"):
+    DB_POOL_SIZE = min(DB_POOL_SIZE, int(os.environ["GUNICORN_THREADS"]))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'tutor.db_pool',
         "NAME": os.environ.get("PROD_DB_NAME"),
         "USER": os.environ.get("PROD_DB_USER"),
         "PASSWORD": os.environ.get("PROD_DB_PS"),
         "HOST": os.environ.get("PROD_DB_HOST"),
         'PORT': '6529',
+        'OPTIONS': {
+            'pool': {
+                'max_size': DB_POOL_SIZE,
+            },
+        },
     }
 }
 
+# Replicas share credentials of the primary, hosts are comma separated
+
+for number, host in enumerate(
+        filter(None, os.environ.get("PROD_DB_REPLICA_HOSTS", "").split(",")),
+        start=1):
+    alias = "replica{}".format(number)
+    DATABASES[alias] = dict(DATABASES["default"], HOST=host.strip(),
+                            TEST={"MIRROR": "default"})
+    DATABASE_REPLICAS.append(alias)
+
+# Cache
+# Redis is shared by workers of all hosts and evicts least recently used
+# entries instead of culling at random.
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ["REDIS_URL"],
+        }
+    }
+
 # AWS S3
 
 AWS_ACCESS_KEY_ID = os.environ.get("S3_ACCESS_KEY")
@@ -43,8 +85,8 @@ AWS_STORAGE_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME")
 
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
-DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
-STATICFILES_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+DEFAULT_FILE_STORAGE = "tutor.storages.MediaStorage"
+STATICFILES_STORAGE = "tutor.storages.StaticStorage"
 
 AWS_S3_HOST = "s3.eu-central-1.amazonaws.com"
 AWS_S3_REGION_NAME = "eu-central-1"
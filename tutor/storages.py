@@ -0,0 +1,41 @@
+import re
+
+from django.contrib.staticfiles.storage import ManifestFilesMixin
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from learning.renditions import RENDITIONS_DIR
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Names of files hashed by ManifestFilesMixin, e.g. main.0c1d2e3f4a5b.css
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+
+class MediaStorage(S3Boto3Storage):
+    """
+    A class to represent S3 storage of uploaded media.
+    Renditions never change under their name,
+    so they are cached by browsers for a year.
+    """
+    def get_object_parameters(self, name):
+        params = super(MediaStorage, self).get_object_parameters(name)
+        if name.startswith(RENDITIONS_DIR + '/'):
+            params['CacheControl'] = IMMUTABLE_CACHE_CONTROL
+        return params
+
+
+class StaticStorage(ManifestFilesMixin, S3Boto3Storage):
+    """
+    A class to represent S3 storage of static files.
+    Files are fingerprinted by collectstatic, so hashed names are cached
+    by browsers for a year. Text assets are stored gzipped, as S3 cannot
+    compress responses itself.
+    """
+    gzip = True
+    querystring_auth = False
+
+    def get_object_parameters(self, name):
+        params = super(StaticStorage, self).get_object_parameters(name)
+        if HASHED_NAME_RE.search(name):
+            params['CacheControl'] = IMMUTABLE_CACHE_CONTROL
+        return params
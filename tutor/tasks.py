@@ -0,0 +1,43 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+    thread_name_prefix='tutor-tasks')
+
+
+def run(task, *args):
+    """
+    Runs the task and closes database connection of the worker thread.
+    """
+    try:
+        return task(*args)
+    finally:
+        connection.close()
+
+
+def submit(task, *args):
+    """
+    Runs the task in background, outside of the request.
+    Tasks run inline if BACKGROUND_TASKS setting is False.
+    """
+    if not getattr(settings, 'BACKGROUND_TASKS', True):
+        return task(*args)
+    future = executor.submit(run, task, *args)
+    future.add_done_callback(log_exception)
+    return future
+
+
+def log_exception(future):
+    """
+    Logs exception raised by a background task,
+    which the executor would keep in the future unseen.
+    """
+    error = None if future.cancelled() else future.exception()
+    if error is not None:
+        logger.error('Background task failed', exc_info=error)
@@ -0,0 +1,108 @@
+import time
+
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from tutor.middleware import ReplicaMiddleware
+from tutor.routers import (ReplicaRouter, RoutingState, routing_state,
+                           use_primary)
+
+REPLICAS = ['replica1', 'replica2']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTests(SimpleTestCase):
+    """
+    A class to represent tests of routing of reads to replicas.
+    """
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def route(self, state):
+        token = routing_state.set(state)
+        self.addCleanup(routing_state.reset, token)
+        return state
+
+    def test_reads_outside_of_requests(self):
+        self.assertEqual(self.router.db_for_read(None), DEFAULT_DB_ALIAS)
+
+    def test_request_sticks_to_one_replica(self):
+        self.route(RoutingState())
+        aliases = {self.router.db_for_read(None) for i in range(20)}
+        self.assertEqual(len(aliases), 1)
+        self.assertIn(aliases.pop(), REPLICAS)
+
+    def test_reads_after_write(self):
+        self.route(RoutingState())
+        self.router.db_for_read(None)
+        self.assertEqual(self.router.db_for_write(None), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(None), DEFAULT_DB_ALIAS)
+
+    def test_primary_request(self):
+        self.route(RoutingState(primary=True))
+        self.assertEqual(self.router.db_for_read(None), DEFAULT_DB_ALIAS)
+
+    def test_use_primary(self):
+        state = self.route(RoutingState())
+        replica = self.router.db_for_read(None)
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(None), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.router.db_for_read(None), replica)
+        self.assertFalse(state.primary)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.route(RoutingState())
+        self.assertEqual(self.router.db_for_read(None), DEFAULT_DB_ALIAS)
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS, REPLICA_STICKY_COOKIE='primary',
+                   REPLICA_STICKY_SECONDS=10)
+class ReplicaMiddlewareTests(SimpleTestCase):
+    """
+    A class to represent tests of clients kept on the primary
+    after they wrote.
+    """
+    def handle(self, method='get', write=False, **cookies):
+        """
+        Returns alias of a read made by the view and the response.
+        """
+        router = ReplicaRouter()
+        aliases = []
+
+        def get_response(request):
+            aliases.append(router.db_for_read(None))
+            if write:
+                router.db_for_write(None)
+            return HttpResponse()
+
+        factory = RequestFactory()
+        for key, value in cookies.items():
+            factory.cookies[key] = value
+        response = ReplicaMiddleware(get_response)(
+            getattr(factory, method)('/'))
+        return aliases[0], response
+
+    def test_read_only_request(self):
+        alias, response = self.handle()
+        self.assertIn(alias, REPLICAS)
+        self.assertNotIn('primary', response.cookies)
+
+    def test_unsafe_request(self):
+        alias, response = self.handle('post')
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+    def test_client_sticks_after_write(self):
+        alias, response = self.handle(write=True)
+        cookie = response.cookies['primary']
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertGreater(float(cookie.value), time.time())
+        alias, response = self.handle(primary=cookie.value)
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+    def test_expired_or_invalid_cookie(self):
+        for value in [str(int(time.time()) - 1), 'invalid']:
+            with self.subTest(value=value):
+                alias, response = self.handle(primary=value)
+                self.assertIn(alias, REPLICAS)
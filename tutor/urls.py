@@ -17,6 +17,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
+from tutor.metrics import metrics_view
 from users.views import (Custom400View, Custom403View, Custom404View,
                          Custom500View)
 
@@ -24,9 +25,12 @@ urlpatterns = [
     path('', include('users.urls')),
     path('', include('learning.urls')),
     path('admin/', admin.site.urls),
-    path('__debug__/', include('debug_toolbar.urls')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    urlpatterns += [path('__debug__/', include('debug_toolbar.urls'))]
+
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 handler400 = Custom400View.as_view()
@@ -13,7 +13,7 @@ from pathlib import Path
 from django.core.wsgi import get_wsgi_application
 from dotenv import load_dotenv
 
-env_path = Path(__file__).resolve().parent / 'tutor/settings/.env-dev'
+env_path = Path(__file__).resolve().parent / 'settings/.env-dev'
 load_dotenv(dotenv_path=env_path)
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tutor.settings')
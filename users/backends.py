@@ -0,0 +1,65 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from tutor.cache import bump_version, get_version
+from tutor.routers import use_primary
+
+PERMISSIONS_VERSION_KEY = 'users:permissions:version'
+
+USER_PERMISSIONS_VERSION_KEY = 'users:user:{}:permissions:version'
+
+PERMISSIONS_KEY = 'users:user:{}:permissions:{}:{}'
+
+# Versions make stale entries unreachable, timeout removes them
+PERMISSIONS_TIMEOUT = 60 * 60
+
+
+def get_permissions_key(user_id):
+    """
+    Returns cache key of permissions of the user, which changes with
+    permissions of the user and of any group.
+    """
+    return PERMISSIONS_KEY.format(
+        user_id,
+        get_version(PERMISSIONS_VERSION_KEY),
+        get_version(USER_PERMISSIONS_VERSION_KEY.format(user_id)))
+
+
+def bump_user_permissions(user_ids):
+    """
+    Invalidates cached permissions of the users.
+    """
+    for user_id in user_ids:
+        bump_version(USER_PERMISSIONS_VERSION_KEY.format(user_id))
+
+
+def bump_permissions():
+    """
+    Invalidates cached permissions of all users,
+    e.g. after permissions of a group changed.
+    """
+    bump_version(PERMISSIONS_VERSION_KEY)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    A class to represent authentication backend, which keeps permissions
+    of users in the shared cache, so permission checks of teacher pages
+    do not query user and group permissions. Cache keys are versioned,
+    signals bump versions when groups or permissions change.
+    Cached permissions are read from the primary, so a lagging replica
+    does not store permissions of the previous version.
+    """
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            key = get_permissions_key(user_obj.pk)
+            permissions = cache.get(key)
+            if permissions is None:
+                with use_primary():
+                    permissions = super(CachedModelBackend,
+                                        self).get_all_permissions(user_obj)
+                cache.set(key, permissions, PERMISSIONS_TIMEOUT)
+            user_obj._perm_cache = permissions
+        return user_obj._perm_cache
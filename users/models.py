@@ -3,10 +3,15 @@ from io import BytesIO
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
-from django.core.files.uploadedfile import SimpleUploadedFile
-from django.db import models
+from django.core.files.base import ContentFile
+from django.db import models, transaction
 from django.utils.text import slugify
 from PIL import Image
+from tutor.tasks import submit
+
+from .tasks import resize_profile_picture
+
+DEFAULT_PICTURE = 'profile_pictures/profile_default.jpg'
 
 
 class User(AbstractUser):
@@ -30,7 +35,7 @@ class Profile(models.Model):
     user = models.OneToOneField(get_user_model(),
                              on_delete=models.CASCADE)
     profile_picture = models.ImageField(
-        default="profile_pictures/profile_default.jpg",
+        default=DEFAULT_PICTURE,
         blank=True, 
         null=True,
         upload_to='profile_pictures/')
@@ -38,6 +43,35 @@ class Profile(models.Model):
     location = models.CharField(max_length=50, blank=True)
     slug = models.SlugField(max_length=150, unique=True)
 
+    def __init__(self, *args, **kwargs):
+        super(Profile, self).__init__(*args, **kwargs)
+        self._saved_picture = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remembers picture loaded from database to detect its change.
+        """
+        instance = super(Profile, cls).from_db(db, field_names, values)
+        instance._saved_picture = instance.get_loaded_picture()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        """
+        Remembers picture loaded later, e.g. when deferred field
+        is accessed.
+        """
+        super(Profile, self).refresh_from_db(using, fields)
+        if fields is None or 'profile_picture' in fields:
+            self._saved_picture = self.get_loaded_picture()
+
+    def get_loaded_picture(self):
+        """
+        Returns name of the picture, None if the field is deferred.
+        """
+        picture = self.__dict__.get('profile_picture')
+        return getattr(picture, 'name', picture)
+
     def restore_default_picutre(self, *args, **kwargs):
         """
         Restores default profile picture on delete
@@ -45,24 +79,35 @@ class Profile(models.Model):
         if self.profile_picture:
             pass
         else:
-            self.profile_picture = 'profile_pictures/profile_default.jpg'
+            self.profile_picture = DEFAULT_PICTURE
         return self.profile_picture
     
+    def picture_changed(self):
+        """
+        Checks if a new picture, other than default, needs resizing.
+        """
+        name = self.profile_picture.name
+        return bool(name) and name != DEFAULT_PICTURE \
+            and name != self._saved_picture
+
     def resize(self, *args, **kwargs):
         """
-        Resizes the profile picture on save
+        Resizes the profile picture.
+        Resized picture is saved under a new name,
+        original file is left untouched.
         """
-        img = Image.open(self.profile_picture)
-        file_format = img.format
-        if img.height > 200 or img.width > 200:
-            img.thumbnail((200, 200), Image.ANTIALIAS)
+        with self.profile_picture.open() as picture:
+            img = Image.open(picture)
+            file_format = img.format
+            if img.height <= 200 and img.width <= 200:
+                return self.profile_picture
+            img.thumbnail((200, 200), Image.LANCZOS)
             img_io = BytesIO()
             img.save(img_io, file_format)
-            img_io.seek(0)
-            suf = SimpleUploadedFile(
-                os.path.split(self.profile_picture.name)[-1],
-                  img_io.read())
-            self.profile_picture.save(suf.name + file_format, suf, save=False)
+        self.profile_picture.save(
+            os.path.split(self.profile_picture.name)[-1],
+            ContentFile(img_io.getvalue()),
+            save=False)
         return self.profile_picture
     
     def add_slug(self, *args, **kwargs):
@@ -78,7 +123,12 @@ class Profile(models.Model):
         Overrise save to add additional methods
         """
         self.profile_picture = self.restore_default_picutre()
-        self.profile_picture = self.resize()
         self.slug = self.add_slug()
+        changed = self.picture_changed()
         super(Profile, self).save(*args, **kwargs)
+        self._saved_picture = self.profile_picture.name
+        if changed:
+            pk, name = self.pk, self.profile_picture.name
+            transaction.on_commit(
+                lambda: submit(resize_profile_picture, pk, name))
 
@@ -1,8 +1,12 @@
+from functools import partial
+
 from django import dispatch
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import Group, Permission
+from .backends import bump_permissions, bump_user_permissions
 from .models import Profile
 
 user = get_user_model()
@@ -28,3 +32,58 @@ def add_to_teacher_group(sender, instance, is_teacher, **kwargs):
 	if is_teacher:
 		my_group = Group.objects.get(name='Teachers') 
 		my_group.user_set.add(instance)
+
+
+@receiver(post_save, sender=user)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+	"""
+	Invalidates cached permissions of the user, unless only fields
+	unrelated to permissions were saved, e.g. last_login on login.
+	Permissions are invalidated after commit, so they are never cached
+	again from data of the unfinished transaction.
+	"""
+	if not created and (update_fields is None or
+			{'is_active', 'is_superuser'} & set(update_fields)):
+		transaction.on_commit(partial(bump_user_permissions, [instance.pk]))
+
+
+@receiver(m2m_changed, sender=user.groups.through)
+@receiver(m2m_changed, sender=user.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set,
+							 **kwargs):
+	"""
+	Invalidates cached permissions of users, whose groups or
+	permissions changed, from the user or from the other side,
+	e.g. group.user_set.add(user). Clearing from the other side
+	does not tell the users, it invalidates permissions of all users.
+	"""
+	if action not in ('post_add', 'post_remove', 'post_clear'):
+		return
+	if not reverse:
+		user_ids = [instance.pk]
+	elif pk_set is not None:
+		user_ids = list(pk_set)
+	else:
+		transaction.on_commit(bump_permissions)
+		return
+	transaction.on_commit(partial(bump_user_permissions, user_ids))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+	"""
+	Invalidates cached permissions of all users, when permissions
+	of a group change.
+	"""
+	if action in ('post_add', 'post_remove', 'post_clear'):
+		transaction.on_commit(bump_permissions)
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def permissions_deleted(sender, **kwargs):
+	"""
+	Invalidates cached permissions of all users, when a group
+	or a permission is deleted with its relations.
+	"""
+	transaction.on_commit(bump_permissions)
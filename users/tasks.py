@@ -0,0 +1,26 @@
+from learning.renditions import forget_renditions
+
+
+def resize_profile_picture(profile_id, name):
+    """
+    Resizes the picture of the profile and swaps it in,
+    if profile still uses the same picture.
+    Replaced original is removed from the storage
+    and its renditions are forgotten.
+    """
+    from .models import Profile
+
+    profile = Profile.objects.filter(pk=profile_id,
+                                     profile_picture=name).first()
+    if profile is None:
+        return
+    storage = profile.profile_picture.storage
+    resized = profile.resize().name
+    if resized == name:
+        return
+    updated = Profile.objects.filter(
+        pk=profile_id, profile_picture=name).update(
+            profile_picture=resized)
+    deleted = name if updated else resized
+    storage.delete(deleted)
+    forget_renditions([deleted])
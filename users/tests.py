@@ -1,3 +1,66 @@
-from django.test import TestCase
+from importlib import import_module
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .views import DEMO_SESSION_KEY, DEMO_USER_ID
+
+
+@override_settings(
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    SESSION_ENGINE='tutor.sessions')
+class DemoSessionTests(TestCase):
+    """
+    A class to represent tests of the session shared by demo visitors.
+    """
+    def setUp(self):
+        User = get_user_model()
+        User.objects.create_user('demo', id=DEMO_USER_ID)
+        self.addCleanup(cache.clear)
+
+    def visit_demo(self):
+        client = Client()
+        client.get(reverse('users:default_log_in'))
+        return client
+
+    def get_shared_session(self):
+        engine = import_module(settings.SESSION_ENGINE)
+        return engine.SessionStore(cache.get(DEMO_SESSION_KEY))
+
+    def assertSharedSessionKept(self, client):
+        session_key = cache.get(DEMO_SESSION_KEY)
+        self.assertEqual(self.get_shared_session().get(SESSION_KEY),
+                         str(DEMO_USER_ID))
+        self.assertEqual(client.cookies[settings.SESSION_COOKIE_NAME].value,
+                         session_key)
+
+    def test_visitors_share_session(self):
+        first, second = self.visit_demo(), self.visit_demo()
+        self.assertEqual(first.cookies[settings.SESSION_COOKIE_NAME].value,
+                         second.cookies[settings.SESSION_COOKIE_NAME].value)
+
+    def test_logout_keeps_shared_session(self):
+        first, second = self.visit_demo(), self.visit_demo()
+        first.get(reverse('users:logout'))
+        self.assertSharedSessionKept(second)
+        self.assertNotEqual(
+            first.cookies[settings.SESSION_COOKIE_NAME].value,
+            cache.get(DEMO_SESSION_KEY))
+
+    def test_login_keeps_shared_session(self):
+        first, second = self.visit_demo(), self.visit_demo()
+        first.post(reverse('users:register'), {
+            'username': 'student', 'email': 'student@example.com',
+            'password': 'secret-password', 'password2': 'secret-password',
+            'is_student': 'on'})
+        self.assertSharedSessionKept(second)
+        self.assertNotEqual(
+            first.cookies[settings.SESSION_COOKIE_NAME].value,
+            cache.get(DEMO_SESSION_KEY))
+        self.assertEqual(first.session.get(SESSION_KEY),
+                         str(get_user_model().objects.get(
+                             username='student').pk))
@@ -1,5 +1,6 @@
 from django.contrib.auth import views as auth_views
 from django.urls import path
+from tutor.querybudget import query_budget
 
 from . import views
 from .forms import UserLoginForm
@@ -8,14 +9,14 @@ from .forms import UserLoginForm
 app_name = 'users'
 urlpatterns = [
     path('login/', 
-        auth_views.LoginView.as_view(
+        query_budget(get=2)(auth_views.LoginView.as_view(
         redirect_authenticated_user=True,
         template_name='registration/login.html',
-        authentication_form=UserLoginForm),
+        authentication_form=UserLoginForm)),
         name='login'),
 
     path('logout/', 
-        auth_views.LogoutView.as_view(), 
+        query_budget(4)(auth_views.LogoutView.as_view()), 
         name='logout'),
 
     path('register/', 
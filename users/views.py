@@ -1,16 +1,27 @@
+from importlib import import_module
+
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import get_user_model, login
+from django.contrib.auth import SESSION_KEY, get_user_model, login
 from django.contrib.messages.views import SuccessMessageMixin
+from django.core.cache import cache
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
 from django.views.generic import RedirectView, TemplateView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, UpdateView
+from tutor.querybudget import query_budget
+from tutor.sessions import SHARED_SESSION_KEY
 
 from .forms import ProfileUpdateForm, RegisterForm
 from .models import Profile
 
+DEMO_USER_ID = 2
+
+DEMO_SESSION_KEY = 'users:demo-session'
 
+
+@query_budget(get=4)
 class UserCreateView(SuccessMessageMixin, CreateView):
     """A class to represent user creation view """
     template_name = 'registration/register.html'
@@ -35,31 +46,34 @@ class UserCreateView(SuccessMessageMixin, CreateView):
         return valid
 
     
+@query_budget(5)
 class ProfileView(DetailView):
     """
     A class to represent profile information view
     """
     template_name = 'users/profile.html'
-    model = Profile
+    queryset = Profile.objects.select_related('user')
 
 
+@query_budget(get=5)
 class ProfileUpdateView(SuccessMessageMixin, UpdateView):
     """
     A class to represent user update view.
     """
-    model = Profile
+    queryset = Profile.objects.select_related('user')
     template_name = 'users/edit_profile.html'
     form_class = ProfileUpdateForm
     success_message = "Your profile has been updated successfully"
     
     def get_success_url(self):
         """
-        Gets user pk to use in URL.
+        Gets profile slug to use in URL.
         """
-        profile_id = self.kwargs['pk']
-        return reverse_lazy('users:profile', kwargs={'pk': profile_id})
+        return reverse_lazy('users:profile',
+                            kwargs={'slug': self.object.slug})
     
 
+@query_budget(5)
 class DefaultLogIn(RedirectView, SuccessMessageMixin):
     """
     A class that is used to automatically log in a user
@@ -70,17 +84,44 @@ class DefaultLogIn(RedirectView, SuccessMessageMixin):
         """
         Logs as user with id 2 on GET on main site.
         User with id 2 should always be provided in fixture.
+        Visitors logged in as the user already are only redirected,
+        others share the session of the user while it is valid,
+        so visits do not create new sessions. The session is marked
+        shared, so a visitor logging out does not end it for others.
         """
-        User = get_user_model()
-        user = User.objects.get(id=2)
-
-        if user is not None:
-            login(request, user)
-            messages.add_message(
-                request, 
-                messages.SUCCESS, 
-                'You have been automatically logged in')
+        if request.session.get(SESSION_KEY) == str(DEMO_USER_ID):
             return redirect('learning:dashboard')
+        if not self.reuse_demo_session(request):
+            User = get_user_model()
+            user = User.objects.get(id=DEMO_USER_ID)
+            login(request, user)
+            request.session[SHARED_SESSION_KEY] = True
+            if request.session.session_key:
+                cache.set(DEMO_SESSION_KEY, request.session.session_key,
+                          request.session.get_expiry_age())
+        messages.add_message(
+            request, 
+            messages.SUCCESS, 
+            'You have been automatically logged in')
+        return redirect('learning:dashboard')
+
+    def reuse_demo_session(self, request):
+        """
+        Swaps session of the request for the cached session of the user,
+        if it still exists. Session is marked modified, so its cookie is
+        set, but it is not written, as its data did not change.
+        """
+        session_key = cache.get(DEMO_SESSION_KEY)
+        if not session_key:
+            return False
+        session = import_module(settings.SESSION_ENGINE).SessionStore(
+            session_key)
+        if session.get(SESSION_KEY) != str(DEMO_USER_ID) or \
+                not session.get(SHARED_SESSION_KEY):
+            return False
+        session.modified = True
+        request.session = session
+        return True
         
 
 class Custom400View(TemplateView):